@@ -0,0 +1,150 @@
+"""Vaults of different sizes and frames of different shapes shared by the benchmarks.
+
+The archives are built once per benchmark class (in `setup_cache`) and copied before each measurement,
+so that the writes of one measurement do not affect the next one.
+
+The benchmarks use the API available in all versions (e.g. `save_object` and `load_object`), or check
+if the newer methods exist, so that asv can compare any commit against the earlier ones.
+"""
+import os
+import shutil
+from tempfile import mkdtemp
+from typing import Dict
+
+import numpy as np
+from pandas import DataFrame, date_range
+
+from data_vault import VaultMagics
+from data_vault.vault import Vault
+
+try:
+    from data_vault.python_zip import PythonZip
+except ImportError:
+    # older versions only use 7z, which supports encryption
+    PythonZip = None
+
+ENCRYPTION_VARIABLE = 'DATA_VAULT_BENCHMARK_KEY'
+os.environ.setdefault(ENCRYPTION_VARIABLE, 'benchmark')
+
+# multi-GB archives take minutes to build, thus are only benchmarked when this variable is set
+LARGE_VARIABLE = 'DATA_VAULT_BENCHMARK_LARGE'
+
+ARCHIVE_SIZES = ['empty', 'thousands', 'large']
+THOUSANDS_MEMBERS = 2000
+LARGE_MEMBERS = 8
+LARGE_MEMBER_ROWS = 2**23  # about 200 MB of tab-separated floats in each member
+
+ROWS = [1000, 30000]
+DTYPES = ['numeric', 'mixed']
+ENCRYPTION = [False, True]
+VARIABLES = [1, 4]
+
+MODULE = 'benchmark'
+
+
+def open_vault(path: str, encrypted: bool, **settings) -> Vault:
+    return Vault({
+        **VaultMagics.defaults,
+        'path': path,
+        'encryption_variable': ENCRYPTION_VARIABLE if encrypted else None,
+        **settings
+    })
+
+
+def save(vault: Vault, values_by_path: Dict, compression: str = None):
+    """Store the values in a single update with `save_objects`, or one by one in versions without it."""
+    if hasattr(vault, 'save_objects'):
+        vault.save_objects(values_by_path, **({'compression': compression} if compression else {}))
+    else:
+        for path, value in values_by_path.items():
+            vault.save_object(path, value, None)
+
+
+def load(vault: Vault, variables_by_path: Dict[str, str]):
+    """Import the members with `load_objects`, or one by one in versions without it."""
+    if hasattr(vault, 'load_objects'):
+        vault.load_objects(variables_by_path)
+    else:
+        for path, variable in variables_by_path.items():
+            vault.load_object(path, variable)
+
+
+def checksum(vault: Vault, path: str, verify: bool):
+    """Get the CRC32 of the member; versions without `Vault.checksum` always calculate it from the data."""
+    if hasattr(vault, 'checksum'):
+        return vault.checksum(path, verify=verify)
+    return vault.archive.calc_checksum(path, method='CRC32')
+
+
+def make_frame(rows: int, dtypes: str, seed: int = 0) -> DataFrame:
+    """Frame with 8 numeric columns, or 17 columns of mixed dtypes (numbers, strings, booleans, dates)."""
+    random = np.random.default_rng(seed)
+    if dtypes == 'numeric':
+        return DataFrame({
+            **{f'int_{i}': random.integers(0, 1000, rows) for i in range(4)},
+            **{f'float_{i}': random.random(rows) for i in range(4)}
+        })
+    columns = {}
+    for i in range(4):
+        columns[f'int_{i}'] = random.integers(0, 1000, rows)
+        columns[f'float_{i}'] = random.random(rows)
+        columns[f'text_{i}'] = random.choice(['alpha', 'beta', 'gamma', 'delta'], rows)
+        columns[f'flag_{i}'] = random.random(rows) > 0.5
+    frame = DataFrame(columns)
+    frame['date_0'] = date_range('2000-01-01', periods=rows, freq='min')
+    return frame
+
+
+def _build_archive(path: str, size: str, encrypted: bool):
+    vault = open_vault(path, encrypted)
+    if size == 'thousands':
+        frame = make_frame(rows=10, dtypes='numeric')
+        save(vault, {
+            f'filler/{i}': frame.assign(int_0=i)
+            for i in range(THOUSANDS_MEMBERS)
+        })
+    elif size == 'large':
+        random = np.random.default_rng(0)
+        for i in range(LARGE_MEMBERS):
+            # frames, as arrays cannot be stored with the default exporter of older versions
+            save(vault, {f'filler/{i}': DataFrame({'value': random.random(LARGE_MEMBER_ROWS)})}, compression='stored')
+
+
+def build_archives() -> Dict[str, str]:
+    """Build the archive of each size (with and without encryption), return the paths by `archive_key`.
+
+    The archives are built in the working directory, which asv removes once the benchmarks finish.
+    """
+    directory = os.path.abspath('archives')
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for size in ARCHIVE_SIZES:
+        if size == 'large' and not os.environ.get(LARGE_VARIABLE):
+            continue
+        for encrypted in ENCRYPTION:
+            if encrypted and PythonZip and not PythonZip.supports_encryption():
+                continue
+            key = archive_key(size, encrypted)
+            paths[key] = os.path.join(directory, key + '.zip')
+            _build_archive(paths[key], size, encrypted)
+    return paths
+
+
+def archive_key(size: str, encrypted: bool) -> str:
+    return size + ('-encrypted' if encrypted else '')
+
+
+def copy_archive(archives: Dict[str, str], size: str, encrypted: bool) -> str:
+    """Copy the prebuilt archive to a new location; skips the benchmark if the archive was not built."""
+    key = archive_key(size, encrypted)
+    if key not in archives:
+        # asv skips the parameter combinations which raise NotImplementedError in setup
+        raise NotImplementedError(f'Archive {key} not available')
+    path = os.path.join(mkdtemp(prefix='data-vault-benchmark-'), 'archive.zip')
+    if os.path.exists(archives[key]):
+        shutil.copy(archives[key], path)
+    return path
+
+
+def remove_archive(path: str):
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
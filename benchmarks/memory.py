@@ -0,0 +1,21 @@
+"""Latency and peak memory of the memory optimization applied to imported DataFrames."""
+from data_vault.memory import optimize_memory
+
+from .common import DTYPES, ROWS, make_frame
+
+
+class OptimizeMemory:
+    number = 1
+    repeat = (1, 5, 20.0)
+    params = [ROWS, DTYPES]
+    param_names = ['rows', 'dtypes']
+
+    def setup(self, rows, dtypes):
+        self.frame = make_frame(rows, dtypes)
+
+    # the frame is copied, so that each repeat optimizes the original (not already optimized) frame
+    def time_optimize_memory(self, rows, dtypes):
+        optimize_memory(self.frame, inplace=False, report=False)
+
+    def peakmem_optimize_memory(self, rows, dtypes):
+        optimize_memory(self.frame, inplace=False, report=False)
@@ -0,0 +1,94 @@
+"""Latency and peak memory of the vault operations backing `%vault store`, `import`, `del` and `assert`."""
+from data_vault.frames import frame_manager
+
+from .common import (
+    ARCHIVE_SIZES, DTYPES, ENCRYPTION, MODULE, ROWS, VARIABLES,
+    build_archives, checksum, copy_archive, load, make_frame, open_vault, remove_archive, save
+)
+
+
+class VaultBenchmark:
+    # each measurement needs a fresh copy of the archive
+    number = 1
+    # between 1 and 5 samples, for up to 20 seconds
+    repeat = (1, 5, 20.0)
+    timeout = 600
+
+    def setup_cache(self):
+        return build_archives()
+
+    def teardown(self, archives, *params):
+        remove_archive(self.path)
+
+
+class Store(VaultBenchmark):
+    params = [ARCHIVE_SIZES, ROWS, DTYPES, ENCRYPTION, VARIABLES]
+    param_names = ['archive', 'rows', 'dtypes', 'encrypted', 'variables']
+
+    def setup(self, archives, archive, rows, dtypes, encrypted, variables):
+        self.path = copy_archive(archives, archive, encrypted)
+        self.vault = open_vault(self.path, encrypted)
+        self.values = {
+            f'{MODULE}/x_{i}': make_frame(rows, dtypes, seed=i)
+            for i in range(variables)
+        }
+
+    def time_store(self, *params):
+        save(self.vault, self.values)
+
+    def peakmem_store(self, *params):
+        save(self.vault, self.values)
+
+
+class Import(VaultBenchmark):
+    params = [ARCHIVE_SIZES, ROWS, DTYPES, ENCRYPTION, VARIABLES]
+    param_names = ['archive', 'rows', 'dtypes', 'encrypted', 'variables']
+
+    def setup(self, archives, archive, rows, dtypes, encrypted, variables):
+        self.path = copy_archive(archives, archive, encrypted)
+        self.vault = open_vault(self.path, encrypted)
+        values = {
+            f'{MODULE}/x_{i}': make_frame(rows, dtypes, seed=i)
+            for i in range(variables)
+        }
+        save(self.vault, values)
+        self.variables_by_path = {path: path.split('/')[-1] for path in values}
+        frame_manager.ipython_globals = {'__name__': '__main__'}
+
+    def time_import(self, *params):
+        load(self.vault, self.variables_by_path)
+
+    def peakmem_import(self, *params):
+        load(self.vault, self.variables_by_path)
+
+
+class Delete(VaultBenchmark):
+    params = [ARCHIVE_SIZES, ROWS, ENCRYPTION]
+    param_names = ['archive', 'rows', 'encrypted']
+
+    def setup(self, archives, archive, rows, encrypted):
+        self.path = copy_archive(archives, archive, encrypted)
+        self.vault = open_vault(self.path, encrypted)
+        self.vault.save_object(f'{MODULE}/x', make_frame(rows, 'numeric'), exporter=None)
+
+    def time_delete(self, *params):
+        self.vault.remove_object(f'{MODULE}/x')
+
+    def peakmem_delete(self, *params):
+        self.vault.remove_object(f'{MODULE}/x')
+
+
+class Assert(VaultBenchmark):
+    params = [ARCHIVE_SIZES, ROWS, ENCRYPTION, [False, True]]
+    param_names = ['archive', 'rows', 'encrypted', 'verify']
+
+    def setup(self, archives, archive, rows, encrypted, verify):
+        self.path = copy_archive(archives, archive, encrypted)
+        self.vault = open_vault(self.path, encrypted)
+        self.vault.save_object(f'{MODULE}/x', make_frame(rows, 'numeric'), exporter=None)
+
+    def time_assert(self, archives, archive, rows, encrypted, verify):
+        checksum(self.vault, f'{MODULE}/x', verify)
+
+    def peakmem_assert(self, archives, archive, rows, encrypted, verify):
+        checksum(self.vault, f'{MODULE}/x', verify)
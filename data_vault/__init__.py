@@ -1,17 +1,21 @@
-import gzip
-import json
+import os
 from typing import List
 from warnings import warn
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from IPython.display import display, Markdown
 from IPython import get_ipython
 from IPython.core.magic import Magics, magics_class, line_magic, needs_local_scope
 
 from .action import Action
-from .actions import StoreAction, ImportAction, DeleteAction, AssertAction
+from .actions import (
+    StoreAction, ImportAction, DeleteAction, AssertAction, VerifyAction, CompactAction, HistoryAction
+)
 from .frames import frame_manager
-from .parsing import parse_arguments, clean_line
+from .history import History
+from .log_writer import LogWriter
+from .parsing import parse_arguments, clean_line, short_aliases_of_keys
+from .timing import Timings, phase
 from .vault import Vault
 
 
@@ -36,25 +40,69 @@ class VaultMagics(Magics):
         'metadata': True,
         'logs_path': '{path}.vault.log.gz',
         'gzip_logs': True,
+        # the logs are written in batches of up to this many records, at least this often (in seconds)
+        'logs_buffer_size': 100,
+        'logs_flush_interval': 1,
+        # SQLite database with the history of the operations, indexed for queries with `%vault history`
+        'history_path': '{path}.vault.history.sqlite',
         'report_memory_gain': False,
         # aggressive memory optimisation by categorising numbers
         'numbers_as_categories': False,
-        'booleans_as_categories': False
-        # 'allowed_duration': 30,  # seconds
+        'booleans_as_categories': False,
+        # convert floats holding integers with missing values (e.g. integer columns with NaN) to nullable integers
+        'nullable_integers': False,
+        # archive backend: 'python' (in-process), '7z' (command line tool),
+        # or 'auto' (in-process unless encryption is needed and pyzipper is not installed)
+        'backend': 'auto',
+        # when to test the archive after writes: 'member' (only the written members),
+        # 'full' (entire archive after each write), a number N (entire archive every N writes),
+        # 'close' (entire archive on %close_vault) or 'deferred' (only on explicit %vault verify)
+        'integrity': 'member',
+        # format used by the default exporter and importer of DataFrames: 'csv' (tab-separated, human-readable),
+        # or binary formats preserving dtypes: 'parquet', 'feather', 'arrow' (Arrow IPC stream); these require pyarrow
+        'format': 'csv',
+        # compression of the stored members: 'stored' (none), 'deflated', 'bzip2' or 'lzma', optionally with
+        # the level (e.g. 'deflated:9'), or 'auto' to choose the method for each member by compressing a sample
+        'compression': 'deflated',
+        # import members stored without compression (nor encryption) in NumPy and Arrow-based formats by
+        # memory-mapping the archive; the checksums of such imports are taken from the manifest, not verified
+        'memory_map': False,
+        # number of workers exporting and compressing (or decompressing and parsing) multiple variables
+        # concurrently, and the kind of the pool: 'thread' or 'process' (requires picklable values and functions)
+        'workers': 1,
+        'pool': 'thread',
+        # memory budget (in MB) for the values cached by modules imported with `%vault import module`
+        'module_cache_size': 1024,
+        # 'rewrite' the archive on each change, or 'append' the changes to the end of the archive (in-process
+        # backend only) leaving the superseded data as dead space, which is removed by compacting the archive
+        # (with `%vault compact`, or automatically once it exceeds the threshold fraction of the archive size)
+        'write_mode': 'rewrite',
+        'compaction_threshold': 0.5,
+        # warn if a command takes longer than this (in seconds; False to disable), naming the slowest phase
+        'allowed_duration': 30,
+        # record the peak memory allocated by Python (tracemalloc) and the change of the resident set size
+        # in each phase of the commands (slows down the commands; less precise before Python 3.9)
+        'track_memory': False,
+        # store each top-level module in a separate archive (in the directory given by `path`), so that
+        # modules can be written concurrently and a change to one module does not rewrite the others
+        'sharded': False
     }
 
-    assert len(set([d[0] for d in defaults])) == len(defaults)
-
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.settings = None
         self.current_vault: Vault = None
+        self.history: History = None
+        self.log_writer: LogWriter = None
 
     actions: List[Action] = [
         StoreAction,
         ImportAction,
         DeleteAction,
-        AssertAction
+        AssertAction,
+        VerifyAction,
+        CompactAction,
+        HistoryAction
     ]
 
     @needs_local_scope
@@ -62,8 +110,32 @@ class VaultMagics(Magics):
     def open_vault(self, line, local_ns=None):
         """Open a zip archive for the vault. Once opened, all subsequent `%vault` magics operate on this archive."""
         frame_manager.ipython_globals = local_ns
-        self.settings = parse_arguments(line, self.defaults)
-        self.current_vault = Vault(self.settings)
+        settings = parse_arguments(line, self.defaults)
+        # validates the settings before opening the history and the logs, so that nothing is left open
+        vault = Vault(settings)
+        history_path = settings['history_path'].format(**settings)
+        logs_path = settings['logs_path'].format(**settings)
+        for path in [history_path, logs_path]:
+            # e.g. the directory of a sharded vault, created on the first write otherwise
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        history = History(history_path)
+        try:
+            # the operations logged before the history was introduced
+            history.import_logs(logs_path, gzipped=settings['gzip_logs'])
+            log_writer = LogWriter(
+                logs_path, gzipped=settings['gzip_logs'], history=history,
+                max_records=int(settings['logs_buffer_size']), max_delay=float(settings['logs_flush_interval'])
+            )
+        except Exception:
+            history.close()
+            raise
+        vault.log = log_writer.write
+        if self.current_vault:
+            self._close()
+        self.settings = settings
+        self.current_vault = vault
+        self.history = history
+        self.log_writer = log_writer
         if self.settings['secure'] and not self.settings['encryption_variable']:
             warn(
                 'Encryption variable not set - no encryption will be used.'
@@ -74,23 +146,50 @@ class VaultMagics(Magics):
             )
 
     open_vault.__doc__ += '\n\nOpen vault arguments:\n\n' + '\n'.join([
-        f'\t --{key}, -{key[0]}, default {value}'
-        for key, value in defaults.items()
+        f'\t --{key}, ' + (f'-{alias}, ' if alias else '') + f'default {value}'
+        for (key, value), alias in zip(defaults.items(), short_aliases_of_keys(defaults))
     ])
 
+    @line_magic
+    def close_vault(self, line):
+        """Close the vault, running the integrity checks deferred until closing (if any)."""
+        self._ensure_configured()
+        self._close()
+
+    def _close(self):
+        try:
+            self.current_vault.close()
+        finally:
+            try:
+                self.log_writer.close()
+            finally:
+                self.history.close()
+                self.settings = None
+                self.current_vault = None
+                self.history = None
+                self.log_writer = None
+
     def _ensure_configured(self):
         if not self.settings:
             raise Exception('Please setup the storage with %open_vault first.')
 
     def append_to_logs(self, metadata):
-        logs_path = self.settings['logs_path'].format(**self.settings)
-        opener = (gzip.open if self.settings['gzip_logs'] else open)
-        with opener(logs_path, mode='ta+') as f:
-            f.write(json.dumps(metadata) + '\n')
+        """Record the metadata in the logs and in the history (in the background, see `LogWriter`)."""
+        self.log_writer.write(metadata)
 
     def extract_arguments(self, line):
-        iterable = iter(clean_line(line))
-        return {key: next(iterable) for key in iterable}
+        """Pair the keywords with their values.
+
+        Options (starting with `--`) go at the end of the command; a keyword or an option followed
+        by an option, or ending the command (e.g. `%vault verify`, `%vault history --since 2024-01-31`) gets value True.
+        """
+        pieces = clean_line(line)
+        arguments = {}
+        while pieces:
+            key = pieces.pop(0)
+            is_flag = not pieces or pieces[0].startswith('--')
+            arguments[key] = True if is_flag else pieces.pop(0)
+        return arguments
 
     def select_action(self, arguments):
 
@@ -103,7 +202,7 @@ class VaultMagics(Magics):
         requested_action = one(requested_actions)
 
         action_class = actions[requested_action]
-        action = action_class(vault=self.current_vault)
+        action = action_class(vault=self.current_vault, history=self.history)
         return action
 
     @needs_local_scope
@@ -115,21 +214,33 @@ class VaultMagics(Magics):
 
         started = self._timestamp()
 
-        arguments = self.extract_arguments(line)
-        action = self.select_action(arguments)
-        metadata = action.perform(arguments)
+        with Timings(track_memory=self.settings['track_memory']) as timings:
+            with phase('arguments'):
+                arguments = self.extract_arguments(line)
+                action = self.select_action(arguments)
+            if action.reads_logs:
+                self.log_writer.flush()
+            try:
+                metadata = action.perform(arguments)
+            except Exception:
+                # write out the operations logged so far, in case the error brings the kernel down
+                self.log_writer.flush()
+                raise
 
         finished = self._timestamp()
 
-        # if finished - started > settings['allowed_duration']:
-        # warn that the operations took longer than expected
+        self._check_duration(finished - started, timings)
 
         metadata['started'] = started.isoformat()
         metadata['finished'] = finished.isoformat()
         metadata['finished_human_readable'] = finished.strftime('%A, %d. %b %Y %H:%M')
+        metadata['phases'] = timings.as_dict()
+        if self.settings['track_memory']:
+            metadata['memory'] = timings.memory()
         metadata['command'] = line
 
-        self.append_to_logs(metadata)
+        if action.logged:
+            self.append_to_logs(metadata)
 
         display(Markdown(
             (
@@ -152,6 +263,18 @@ class VaultMagics(Magics):
     def _timestamp():
         return datetime.utcnow()
 
+    def _check_duration(self, duration: timedelta, timings: Timings):
+        """Warn if the command took longer than the `allowed_duration` setting."""
+        allowed_duration = self.settings['allowed_duration']
+        if allowed_duration is False or duration.total_seconds() <= float(allowed_duration):
+            return
+        slowest = timings.slowest()
+        warn(
+            f'The command took {duration.total_seconds():.1f} seconds,'
+            f' longer than the allowed duration of {allowed_duration} seconds'
+            + (f'; the slowest phase was {slowest} ({timings.durations[slowest]:.1f} seconds)' if slowest else '')
+        )
+
 
 ip = get_ipython()
 if ip:
@@ -2,9 +2,12 @@ from typing import Dict, Callable, List, Union
 from abc import ABC, abstractproperty
 from collections import Counter
 
+from .history import History
 from .vault import Vault
 from .frames import frame_manager
 from .parameters import get_dotted
+from .parsing import bool_or_str
+from .timing import phase
 
 
 Metadata = Dict[str, Union[str, List[Dict]]]
@@ -84,8 +87,15 @@ class Syntax:
 
 class Action(ABC):
 
-    def __init__(self, vault: Vault):
+    # whether to record the action in the logs (and in the history)
+    logged = True
+    # whether the action reads the history (thus needs the buffered logs to be written first)
+    reads_logs = False
+
+    def __init__(self, vault: Vault, history: History = None):
         self.vault: Vault = vault
+        # the history of the operations, opened with the vault
+        self.history: History = history
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -134,14 +144,15 @@ class Action(ABC):
 
     def perform(self, arguments) -> Metadata:
         # choose handler using syntax concordance with the required arguments
-        handler = self.choose_handler(arguments)
-        if not handler:
-            error = 'No command matched. Did you mean:' + self.syntax_help(n=3, arguments=arguments)
-            raise ValueError(error)
+        with phase('arguments'):
+            handler = self.choose_handler(arguments)
+            if not handler:
+                error = 'No command matched. Did you mean:' + self.syntax_help(n=3, arguments=arguments)
+                raise ValueError(error)
 
-        # validate the optional and disallowed parts of the syntax
-        syntax = self.handlers[handler]
-        syntax.validate(arguments)
+            # validate the optional and disallowed parts of the syntax
+            syntax = self.handlers[handler]
+            syntax.validate(arguments)
 
         bound_handler = getattr(self, handler.__name__)
 
@@ -159,7 +170,11 @@ class Action(ABC):
                 for file in ['old_file', 'new_file']
                 if file in result
             ]
-            return f"`{result['subject']}`" + ' (' + ' → '.join(hashcodes) + ')'
+            if result.get('unchanged'):
+                hashcodes = ['unchanged ' + result['new_file'][hash_method]]
+            if result.get('lazy'):
+                hashcodes = ['lazy']
+            return f"`{result['subject']}`" + (' (' + ' → '.join(hashcodes) + ')' if hashcodes else '')
 
         results_n = len(metadata['result'])
 
@@ -185,6 +200,11 @@ class Action(ABC):
             return get_dotted(self.ipython_globals, func_name)
         return None
 
+    @staticmethod
+    def flag(arguments, name) -> bool:
+        """Whether the option `--{name}` was enabled."""
+        return bool_or_str(arguments.get('--' + name, False)) is True
+
     @classmethod
     def explain(cls):
         instance = cls(None)
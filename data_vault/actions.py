@@ -1,12 +1,23 @@
-from .action import Action, Syntax
+from datetime import datetime
+
+from .action import Action, Metadata, Syntax
 from .parameters import ParametersValidator
 from .parsing import split_variables, unquote
 from .dynamic_vault import DynamicVault
+from .lazy import LazyVariable
 
 params = ParametersValidator()
 
 
 class StoreAction(Action):
+    """Store variable(s) in the archive.
+
+    Data which does not compress well (e.g. large numeric arrays) can be stored without compression,
+    which allows to import NumPy arrays and Arrow-based formats by memory-mapping the archive
+    (if the vault was opened with `--memory_map True`):
+
+    > %vault store array in notebook_path --compression stored
+    """
     main_keyword = 'store'
     verb = 'stored'
 
@@ -32,15 +43,15 @@ class StoreAction(Action):
     handlers = {
         store_in_module_as: Syntax(
             required={'store': params.one_or_many_variables, 'in': params.module, 'as': params.valid_id},
-            optional={'with': params.function}
+            optional={'with': params.function, '--compression': params.compression}
         ),
         store_in_module: Syntax(
             required={'store': params.one_or_many_variables, 'in': params.module},
-            optional={'with': params.function, 'as': params.valid_id}
+            optional={'with': params.function, 'as': params.valid_id, '--compression': params.compression}
         ),
         store_in_path: Syntax(
             required={'store': params.one_variable, 'in': params.path},
-            optional={'with': params.function},
+            optional={'with': params.function, '--compression': params.compression},
             disallowed={
                 'as': (
                     '"as" is not allowed for storing in path'
@@ -54,10 +65,18 @@ class StoreAction(Action):
     def _store(self, variables_by_paths, arguments):
         exporter = self.with_function(arguments)
 
-        return [
-            self.vault.save_object(path, self.ipython_globals[variable], exporter, subject=variable)
-            for path, variable in variables_by_paths.items()
-        ]
+        return self.vault.save_objects(
+            {
+                path: self.ipython_globals[variable]
+                for path, variable in variables_by_paths.items()
+            },
+            exporter,
+            {
+                path: {'subject': variable}
+                for path, variable in variables_by_paths.items()
+            },
+            compression=arguments.get('--compression')
+        )
 
 
 class ImportAction(Action):
@@ -67,6 +86,19 @@ class ImportAction(Action):
     > %vault from notebook_path import variable with your_function as variable
     > %vault import 'file.tsv' with your_function as variable
 
+    Large DataFrames can be parsed in chunks of given number of rows, so that the
+    raw text is not held in memory all at once:
+
+    > %vault from notebook_path import variable --chunksize 1000000
+
+    Members of an imported module can be loaded in the background, ahead of their first use:
+
+    > %vault import notebook_path --prefetch
+
+    Variables can be loaded lazily, on their first use, instead of on import:
+
+    > %vault from notebook_path import variable --lazy
+
     It also allows you to specify custom import function, which:
         - has to be available in the global or local namespace
         - should accept a file object
@@ -115,6 +147,8 @@ class ImportAction(Action):
             path = parent
 
         dynamic_vault = DynamicVault(path=path, vault=self.vault)
+        if self.flag(arguments, 'prefetch'):
+            dynamic_vault.prefetch()
         self.ipython_globals[name] = dynamic_vault
 
         return []
@@ -122,19 +156,32 @@ class ImportAction(Action):
     handlers = {
         from_module_import_as: Syntax(
             required={'import': params.valid_id, 'from': params.module, 'as': params.valid_id},
-            optional={'with': params.function}
+            optional={
+                'with': params.function,
+                '--chunksize': params.positive_integer,
+                '--lazy': params.flag
+            }
         ),
         from_module_import: Syntax(
             required={'import': params.one_or_many_valid_id, 'from': params.module},
-            optional={'with': params.function, 'as': params.valid_id}
+            optional={
+                'with': params.function,
+                'as': params.valid_id,
+                '--chunksize': params.positive_integer,
+                '--lazy': params.flag
+            }
         ),
         import_path_as: Syntax(
             required={'import': params.path, 'as': params.valid_id},
-            optional={'with': params.function}
+            optional={
+                'with': params.function,
+                '--chunksize': params.positive_integer,
+                '--lazy': params.flag
+            }
         ),
         import_module: Syntax(
             required={'import': params.module},
-            optional={'as': params.valid_id},
+            optional={'as': params.valid_id, '--prefetch': params.flag},
             disallowed={
                 'with': (
                     '"with" not allowed for module import;'
@@ -147,9 +194,26 @@ class ImportAction(Action):
 
     def _import(self, variables_by_paths, arguments):
         importer = self.with_function(arguments)
+        chunksize = int(arguments['--chunksize']) if '--chunksize' in arguments else None
+
+        if self.flag(arguments, 'lazy'):
+            return self._import_lazily(variables_by_paths, importer=importer, chunksize=chunksize)
 
+        return self.vault.load_objects(variables_by_paths, importer, chunksize=chunksize)
+
+    def _import_lazily(self, variables_by_paths, **load_arguments):
+        namespace = self.ipython_globals
+        for path, variable in variables_by_paths.items():
+            # fail early for missing members
+            self.vault.archive_for(path).get_info(path)
+        for path, variable in variables_by_paths.items():
+            namespace[variable] = LazyVariable(self.vault, path, variable, namespace, **load_arguments)
         return [
-            self.vault.load_object(path, variable, importer)
+            {
+                'path': path,
+                'subject': variable,
+                'lazy': True
+            }
             for path, variable in variables_by_paths.items()
         ]
 
@@ -191,7 +255,8 @@ class DeleteAction(Action):
 class AssertAction(Action):
     """Verify the checksum of the input file, raise AssertionError if it differs.
 
-    By default the checksum is calculated with CRC32."""
+    By default the checksum is calculated with CRC32 and read from the manifest of the archive;
+    use `--verify` to re-calculate it from the data."""
     main_keyword = 'assert'
     verb = 'verified'
 
@@ -205,7 +270,7 @@ class AssertAction(Action):
     def _assert_hash(self, path, arguments):
         expected = arguments['is']
         method = arguments.get('with', 'CRC32')
-        calculated = self.vault.archive.calc_checksum(path, method=method)
+        calculated = self.vault.checksum(path, method=method, verify=self.flag(arguments, 'verify'))
         assert expected == calculated
         return [{
             'subject': path,
@@ -217,10 +282,123 @@ class AssertAction(Action):
     handlers = {
         assert_variable_hash: Syntax(
             required={'assert': params.one_variable, 'in': params.module, 'is': params.hash},
-            optional={'with': params.hash_method}
+            optional={'with': params.hash_method, '--verify': params.flag}
         ),
         assert_path_hash: Syntax(
             required={'assert': params.path, 'is': params.hash},
-            optional={'with': params.hash_method}
+            optional={'with': params.hash_method, '--verify': params.flag}
+        )
+    }
+
+
+class VerifyAction(Action):
+    """Test the integrity of the archive (or of given member) by decompressing the data.
+
+    Useful with the `--integrity` setting other than "full", when tests after writes are limited or deferred."""
+    main_keyword = 'verify'
+    verb = 'verified integrity of'
+
+    def verify_variable(self, arguments):
+        path = arguments['in'] + '/' + arguments['verify']
+        return self._verify(path)
+
+    def verify_path(self, arguments):
+        return self._verify(unquote(arguments['verify']))
+
+    def verify_archive(self, arguments):
+        self.vault.check_integrity()
+        return [{
+            'subject': self.vault.settings['path']
+        }]
+
+    def _verify(self, path):
+        self.vault.check_integrity(path)
+        return [{
+            'subject': path,
+            'old_file': {
+                'crc32': self.vault.checksum(path)
+            }
+        }]
+
+    handlers = {
+        verify_variable: Syntax(
+            required={'verify': params.valid_id, 'in': params.module}
+        ),
+        verify_path: Syntax(
+            required={'verify': params.path}
+        ),
+        verify_archive: Syntax(
+            required={'verify': params.flag}
+        )
+    }
+
+
+class CompactAction(Action):
+    """Rewrite the archive without the data superseded by changes appended with `--write_mode append`."""
+    main_keyword = 'compact'
+    verb = 'compacted'
+
+    def compact_archive(self, arguments):
+        freed = self.vault.compact()
+        return [{
+            'subject': self.vault.settings['path'],
+            'freed_bytes': freed
+        }]
+
+    handlers = {
+        compact_archive: Syntax(
+            required={'compact': params.flag}
+        )
+    }
+
+
+class HistoryAction(Action):
+    """Show the history of operations on the member or module at given path (or on the entire vault),
+    optionally only of these finished since given date or time (in UTC)."""
+    main_keyword = 'history'
+    verb = 'history of'
+    # queries do not change the vault
+    logged = False
+    reads_logs = True
+
+    def history_of_path(self, arguments):
+        return self._history(unquote(arguments['history']), arguments)
+
+    def history_of_module(self, arguments):
+        return self._history(arguments['history'], arguments)
+
+    def history_of_vault(self, arguments):
+        return self._history(None, arguments)
+
+    def _history(self, path, arguments):
+        since = arguments.get('--since')
+        return self.history.query(path, since=datetime.fromisoformat(since).isoformat() if since else None)
+
+    def short_stamp(self, metadata: Metadata) -> str:
+        results = metadata['result']
+        if not results:
+            return 'No operations found'
+        return '\n'.join([
+            '| Finished | Action | Path | Subject | CRC32 |',
+            '|---|---|---|---|---|',
+            *[
+                f"| {result['finished'][:19].replace('T', ' ')} | {result['action']} | `{result['path']}`"
+                f" | `{result['subject']}` | {result['crc32'] or ''} |"
+                for result in results
+            ]
+        ])
+
+    handlers = {
+        history_of_path: Syntax(
+            required={'history': params.path},
+            optional={'--since': params.timestamp}
+        ),
+        history_of_module: Syntax(
+            required={'history': params.module},
+            optional={'--since': params.timestamp}
+        ),
+        history_of_vault: Syntax(
+            required={'history': params.flag},
+            optional={'--since': params.timestamp}
         )
     }
@@ -0,0 +1,298 @@
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from zipfile import ZipFile, ZipInfo, ZIP_STORED, sizeFileHeader, structFileHeader
+
+from .compression import Compression, compression_of
+from .member_tree import MemberTree
+from .timing import phase
+
+# members used by data-vault itself (e.g. the manifest), hidden from listings
+INTERNAL_PREFIX = '.vault/'
+
+_ENCRYPTED_FLAG = 0x01
+# AES-encrypted members have this compression type, and the actual method in the AES extra field
+_AES_COMPRESSION = 99
+_AES_EXTRA_ID = 0x9901
+_DATA_DESCRIPTOR_FLAG = 0x08
+# with signature, for members below the zip64 limit
+_DATA_DESCRIPTOR_SIZE = 16
+
+
+class CompressedFile(str):
+    """Path to a single-member zip file holding data compressed (and encrypted) ahead of adding it to the archive."""
+
+
+class Archive:
+    """Interface shared by the archive backends."""
+
+    def __init__(self, archive_path: str, password=None):
+        self.path = archive_path
+        self.password = password
+        self._index = {}
+        self._tree = MemberTree()
+        self._central_directory_offset = 0
+        # values derived from the current version of the archive (see `cached`)
+        self._cache = {}
+        self._index_signature = None
+        self._recover()
+
+    @property
+    def _journal_path(self) -> str:
+        """Path of the file recording the size of the archive before the append in progress (see `PythonZip.append`)."""
+        return self.path + '.journal'
+
+    def _recover(self):
+        """Truncate the archive to the size it had before an interrupted append (e.g. if the process was killed
+        mid-append), so that its last central directory is found again; the data appended since is discarded."""
+        try:
+            with open(self._journal_path) as f:
+                previous_size = int(f.read())
+        except (FileNotFoundError, ValueError):
+            # no append in progress, or interrupted before the size was recorded (thus before the archive changed)
+            if os.path.exists(self._journal_path):
+                os.remove(self._journal_path)
+            return
+        if self.exists():
+            with open(self.path, 'r+b') as f:
+                f.truncate(previous_size)
+                os.fsync(f.fileno())
+        os.remove(self._journal_path)
+
+    def __getstate__(self):
+        # the index is cheaper to re-read than to pickle (e.g. when sent to a process pool)
+        return {**self.__dict__, '_index': {}, '_tree': MemberTree(), '_cache': {}, '_index_signature': None}
+
+    def exists(self):
+        return Path(self.path).exists()
+
+    def __contains__(self, file_path: str):
+        return file_path in self.index
+
+    def _signature(self):
+        """Identify the version of the archive file by its modification time, size and inode."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    @property
+    def index(self) -> Dict[str, ZipInfo]:
+        """Members (in the order of the central directory) by their paths.
+
+        The central directory is parsed again only if the archive file changed
+        (i.e. its modification time, size or inode differs).
+        """
+        signature = self._signature()
+        if signature != self._index_signature:
+            index = {}
+            central_directory_offset = 0
+            if signature:
+                with ZipFile(self.path) as archive:
+                    index = {info.filename: info for info in archive.infolist()}
+                    central_directory_offset = archive.start_dir
+            tree = MemberTree.from_paths(
+                path
+                for path in index
+                if not path.startswith(INTERNAL_PREFIX)
+            )
+            # the signature is assigned last, so that concurrent readers never see an outdated index as current
+            self._index, self._tree, self._central_directory_offset = index, tree, central_directory_offset
+            self._cache = {}
+            self._index_signature = signature
+        return self._index
+
+    def cached(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Get the value derived from the archive (e.g. the parsed manifest), loading it only once
+        for each version of the archive file (the cache is cleared together with the index)."""
+        self.index  # re-read if the archive changed
+        cache = self._cache
+        if key not in cache:
+            cache[key] = load()
+        return cache[key]
+
+    @property
+    def tree(self) -> MemberTree:
+        """Prefix tree of the members (excluding the internal ones), updated together with the index."""
+        self.index  # re-read if the archive changed
+        return self._tree
+
+    def _resolve_password(self, password):
+        """Get the password to use:
+        - the password set at initialization if `password` is None,
+        - given `password` if not None,
+        - no password if `password` is `False`
+        """
+        if password is False:
+            return None
+        if password is not None:
+            return password
+        return self.password or None
+
+    def open(self, file_path, mode='r', password: str = None):
+        raise NotImplementedError
+
+    def calc_checksum(self, file_path: str, method='CRC32', password=None) -> str:
+        raise NotImplementedError
+
+    def check_integrity(self, *paths: str, password=None):
+        """Test given members, or the entire archive if no paths were given."""
+        raise NotImplementedError
+
+    def _add_file(self, file_path: str, password=None, compression: str = None):
+        raise NotImplementedError
+
+    def rename(self, old_path: str, new_path: str):
+        raise NotImplementedError
+
+    def delete(self, file_to_remove: str):
+        raise NotImplementedError
+
+    def compress(
+        self, file_path: str, path_in_archive: str, password=None, compression: str = None
+    ) -> Optional[CompressedFile]:
+        """Compress the file ahead of adding it to the archive, so that several files can be compressed
+        concurrently before a (serialized) update of the archive.
+
+        Returns None if the backend does not support compressing ahead of the update.
+        """
+        return None
+
+    def add_file(self, file_path: str, password=None, rename: str = False, compression: str = None):
+        assert rename is not True
+        if not rename:
+            self._add_file(file_path, password=password, compression=compression)
+        else:
+            added_path_in_archive = Path(file_path).name
+
+            try:
+                self._add_file(file_path, password=password, compression=compression)
+                if rename in self:
+                    self.delete(rename)
+                self.rename(added_path_in_archive, rename)
+            except Exception:
+                self.delete(added_path_in_archive)
+                raise
+
+    def add_files(self, files: Dict[str, str], password=None, compression: Compression = None):
+        """Add multiple files, given as paths on the disk by the target paths in the archive."""
+        for path_in_archive, file_path in files.items():
+            self.add_file(
+                file_path, password=password, rename=path_in_archive,
+                compression=compression_of(compression, path_in_archive)
+            )
+
+    def update(
+        self, add: Dict[str, str] = None, delete: Iterable[str] = (),
+        rename: Dict[str, str] = None, password=None, compression: Compression = None
+    ):
+        """Delete, rename and add (in this order) members of the archive.
+
+        Args:
+            add: paths of files on the disk by the target paths in the archive;
+                 members which already exist under the target paths are replaced
+            delete: paths of members to remove
+            rename: new paths by old paths of members to rename
+            compression: compression of all added files, or of each file by its target path, given as the name
+                 of the method, optionally with the level (e.g. `deflated:9`; see `parse_compression`)
+        """
+        with phase('delete'):
+            for path in delete:
+                self.delete(path)
+        with phase('rename'):
+            for old_path, new_path in (rename or {}).items():
+                self.rename(old_path, new_path)
+        if add:
+            with phase('add'):
+                self.add_files(add, password=password, compression=compression)
+
+    def append(
+        self, add: Dict[str, str] = None, delete: Iterable[str] = (),
+        rename: Dict[str, str] = None, password=None, compression: Compression = None
+    ):
+        """Apply the changes (see `update`) appending the new data to the end of the archive, if supported
+        by the backend (leaving superseded data as dead space), or rewriting the archive otherwise."""
+        self.update(add=add, delete=delete, rename=rename, password=password, compression=compression)
+
+    def compact(self):
+        """Rewrite the archive without the dead space."""
+        raise NotImplementedError
+
+    def dead_space(self) -> int:
+        """Estimate the size (in bytes) of the data not referenced by the central directory
+        (e.g. members superseded in the append mode, and previous central directories)."""
+        live = sum(
+            sizeFileHeader + len(info.filename.encode()) + len(info.extra) + info.compress_size
+            + (_DATA_DESCRIPTOR_SIZE if info.flag_bits & _DATA_DESCRIPTOR_FLAG else 0)
+            for info in self.index.values()
+        )
+        return max(0, self._central_directory_offset - live)
+
+    def map(self, path) -> Optional[memoryview]:
+        """Memory-map the data of an uncompressed (stored) and unencrypted member, without reading it;
+        return None if the member is compressed, encrypted or empty.
+
+        Only the range of the file holding the member (extended to the allocation granularity) is mapped.
+        """
+        info = self.get_info(path)
+        if info.compress_type != ZIP_STORED or self.is_encrypted(path) or not info.file_size:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(info.header_offset)
+            header = struct.unpack(structFileHeader, f.read(sizeFileHeader))
+            filename_length, extra_length = header[10], header[11]
+            data_offset = info.header_offset + sizeFileHeader + filename_length + extra_length
+            # the offset of the mapping has to be a multiple of the allocation granularity
+            start = data_offset - data_offset % mmap.ALLOCATIONGRANULARITY
+            # the mapping remains valid (and pinned to this version of the archive) after the file is closed;
+            # it is private copy-on-write, so that the objects backed by it can be modified (without changing the file)
+            mapped = mmap.mmap(
+                f.fileno(), data_offset - start + info.file_size, offset=start, access=mmap.ACCESS_COPY
+            )
+        return memoryview(mapped)[data_offset - start:]
+
+    def is_encrypted(self, path) -> bool:
+        return bool(self.get_info(path).flag_bits & _ENCRYPTED_FLAG)
+
+    def compression_method(self, path) -> int:
+        """Compression method of the member (e.g. `ZIP_DEFLATED`), including AES-encrypted members."""
+        info = self.get_info(path)
+        if info.compress_type != _AES_COMPRESSION:
+            return info.compress_type
+        extra = info.extra
+        while len(extra) >= 4:
+            header_id, size = struct.unpack('<HH', extra[:4])
+            if header_id == _AES_EXTRA_ID:
+                # after the version, the vendor and the key strength
+                return struct.unpack('<H', extra[9:11])[0]
+            extra = extra[4 + size:]
+        return info.compress_type
+
+    def get_info(self, path) -> ZipInfo:
+        try:
+            return self.index[path]
+        except KeyError:
+            raise KeyError(f'There is no item named {path!r} in the archive')
+
+    def member_version(self, path) -> Tuple:
+        """Identify the content of the member by its CRC and size; AES-encrypted members
+        have no CRC in the central directory, and are identified by the version of the entire archive instead."""
+        info = self.get_info(path)
+        if info.CRC:
+            return info.CRC, info.file_size
+        return self._index_signature
+
+    def namelist(self):
+        """List paths of all members, including the internal ones."""
+        return list(self.index)
+
+    def list_members(self, relative_to=''):
+        """List paths of the members in given folder (and its sub-folders), relative to the folder."""
+        return self.tree.list(relative_to)
+
+    def list_children(self, relative_to=''):
+        """List names of the members and sub-folders directly in given folder."""
+        return self.tree.list_children(relative_to)
@@ -0,0 +1,98 @@
+import sys
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Hashable, NamedTuple
+
+from pandas import DataFrame, Index, Series
+
+
+def measure(value) -> int:
+    """Estimate the memory used by the value in bytes (deep for pandas objects)."""
+    if isinstance(value, DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (Series, Index)):
+        return int(value.memory_usage(deep=True))
+    return sys.getsizeof(value)
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+
+
+class LRUCache:
+    """Least-recently-used cache limited by the total size (in bytes) of the values.
+
+    Each value is stored with a version (e.g. checksum of the data it was loaded from);
+    a value is returned only if its version matches the requested version, so that outdated
+    values are replaced rather than kept until evicted. Values larger than the entire budget are not cached.
+
+    The cache can be used from multiple threads (e.g. by the background prefetch).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key: Hashable, version: Hashable = None, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.discard(key)
+            self.misses += 1
+            return default
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def holds(self, key: Hashable, version: Hashable = None) -> bool:
+        """Whether the given version of the value is cached (without counting a hit or a miss)."""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] == version
+
+    def put(self, key: Hashable, value: Any, version: Hashable = None):
+        size = measure(value)
+        with self._lock:
+            self.discard(key)
+            if size > self.max_size:
+                return
+            while self._entries and self.size + size > self.max_size:
+                self._evict()
+            self._entries[key] = version, value, size
+            self.size += size
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                version, value, size = self._entries.pop(key)
+                self.size -= size
+
+    def _evict(self):
+        key, (version, value, size) = self._entries.popitem(last=False)
+        self.size -= size
+        self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=self.size,
+            max_size=self.max_size
+        )
@@ -0,0 +1,80 @@
+import hashlib
+import io
+import zlib
+from typing import BinaryIO, Dict, Iterable
+
+from .timing import count, phase
+
+CHUNK_SIZE = 2 ** 20
+
+
+class CRC32:
+    """hashlib-like interface for zlib.crc32"""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data: bytes):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f'{self.value:08X}'
+
+
+def new_hasher(method: str):
+    """Method: one of CRC32 or any algorithm supported by hashlib (e.g. SHA1, SHA256)."""
+    if method == 'CRC32':
+        return CRC32()
+    try:
+        return hashlib.new(method.lower())
+    except ValueError:
+        raise ValueError(f'Checksum method {method} is not supported')
+
+
+def calc_checksums(file_object: BinaryIO, methods: Iterable[str] = ('CRC32', 'SHA256')) -> Dict[str, str]:
+    """Calculate checksums of the file object content in a single pass."""
+    hashers = {method: new_hasher(method) for method in methods}
+    for chunk in iter(lambda: file_object.read(CHUNK_SIZE), b''):
+        for hasher in hashers.values():
+            hasher.update(chunk)
+    return {
+        method: hasher.hexdigest().upper()
+        for method, hasher in hashers.items()
+    }
+
+
+class ChecksumReader(io.RawIOBase):
+    """Read-only stream calculating checksums of the data as it passes through."""
+
+    def __init__(self, stream: BinaryIO, methods: Iterable[str] = ('CRC32', 'SHA256')):
+        super().__init__()
+        self.stream = stream
+        self.hashers = {method: new_hasher(method) for method in methods}
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        with phase('decompress'):
+            data = self.stream.read(size)
+        count('decompress', len(data))
+        with phase('checksum'):
+            for hasher in self.hashers.values():
+                hasher.update(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def exhaust(self):
+        """Read the remaining data (if any) so that the checksums cover the entire stream."""
+        while self.read(CHUNK_SIZE):
+            pass
+
+    def checksums(self) -> Dict[str, str]:
+        return {
+            method: hasher.hexdigest().upper()
+            for method, hasher in self.hashers.items()
+        }
@@ -0,0 +1,98 @@
+import bz2
+import lzma
+import os
+import zlib
+from time import perf_counter
+from typing import Dict, Optional, Tuple, Union
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+
+# compression methods of the zip format (supported by both backends) by their names used in the settings
+COMPRESSION_METHODS = {
+    'stored': ZIP_STORED,
+    'deflated': ZIP_DEFLATED,
+    'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA
+}
+LEVELS = {
+    'deflated': range(0, 10),
+    'bzip2': range(1, 10)
+}
+DEFAULT_COMPRESSION = 'deflated'
+AUTO = 'auto'
+
+# compression of all files, or of individual files by their target paths in the archive
+Compression = Union[str, Dict[str, str], None]
+
+
+def parse_compression(compression: Optional[str]) -> Tuple[str, Optional[int]]:
+    """Split the compression into the name of the method and the level (None for the default level),
+    e.g. `deflated:9` into `('deflated', 9)`; `None` stands for the default compression."""
+    method, _, level = (compression or DEFAULT_COMPRESSION).partition(':')
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(
+            f'Unknown compression method {method}, choose one of: {AUTO}, ' + ', '.join(COMPRESSION_METHODS)
+        )
+    if not level:
+        return method, None
+    if method not in LEVELS or not level.isdigit() or int(level) not in LEVELS[method]:
+        raise ValueError(f'Compression level {level} is not supported for {method}')
+    return method, int(level)
+
+
+def validate_compression(compression: Optional[str]):
+    if compression != AUTO:
+        parse_compression(compression)
+
+
+def compression_of(compression: Compression, path: str) -> Optional[str]:
+    """Compression of the file added under the given path."""
+    if isinstance(compression, dict):
+        return compression.get(path)
+    return compression
+
+
+# candidates for the automatic selection, by the function compressing a sample
+_CANDIDATES = {
+    'deflated:1': lambda data: zlib.compress(data, 1),
+    'deflated:6': lambda data: zlib.compress(data, 6),
+    'bzip2:9': lambda data: bz2.compress(data, 9),
+    'lzma': lambda data: lzma.compress(data)
+}
+# assumed throughput of writing (and later reading or copying) the compressed data, in bytes per second;
+# a method is worth its CPU time if it saves more time on the transfer than it takes
+STORAGE_THROUGHPUT = 20 * 10**6
+SAMPLE_SIZE = 256 * 2**10
+SAMPLES_N = 4
+
+
+def _sample(file_path: str) -> bytes:
+    """Read chunks evenly spread over the file (or the entire file if it is small)."""
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if size <= SAMPLE_SIZE:
+            return f.read()
+        chunk_size = SAMPLE_SIZE // SAMPLES_N
+        chunks = []
+        for i in range(SAMPLES_N):
+            f.seek((size - chunk_size) * i // (SAMPLES_N - 1))
+            chunks.append(f.read(chunk_size))
+        return b''.join(chunks)
+
+
+def choose_compression(file_path: str) -> str:
+    """Choose the compression for the file by compressing a sample of it with each of the candidate methods.
+
+    The chosen method minimizes the time to compress and to write the data (see `STORAGE_THROUGHPUT`);
+    data which does not compress well (e.g. random numbers) is stored without compression.
+    """
+    sample = _sample(file_path)
+    if not sample:
+        return 'stored'
+    best, best_cost = 'stored', len(sample) / STORAGE_THROUGHPUT
+    for compression, compress in _CANDIDATES.items():
+        started = perf_counter()
+        compressed_size = len(compress(sample))
+        cost = perf_counter() - started + compressed_size / STORAGE_THROUGHPUT
+        if cost < best_cost:
+            best, best_cost = compression, cost
+    return best
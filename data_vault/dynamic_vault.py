@@ -1,33 +1,102 @@
 # TODO
-from typing import Dict, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Callable, Hashable, Iterable, Tuple, Union
 
+from .cache import CacheInfo, LRUCache
 from .vault import Vault
 
+_MISSING = object()
+
 
 class DynamicVault:
+    """Members of a folder in the vault, loaded on attribute access; sub-folders are nested `DynamicVault`s.
+
+    Loaded values are kept in a least-recently-used cache limited by the `module_cache_size` setting
+    (in MB, measured with `memory_usage(deep=True)` for pandas objects); cached values are tied to
+    the CRC of the member (see `Archive.member_version`), so a member changed in the archive is loaded again.
+    """
 
-    def __init__(self, path, vault: Vault, cache=True):
+    def __init__(
+        self, path, vault: Vault, cache: Union[bool, LRUCache] = True,
+        pending: Dict[str, Tuple[Hashable, Future]] = None
+    ):
         self.path = path
         self.vault = vault
         self.importers = {}
+        if cache is True:
+            cache = LRUCache(max_size=int(float(vault.settings['module_cache_size']) * 10**6))
         self.cache = cache
-        self.cached = {}
+        # loads in progress (by the prefetch), shared with the nested modules
+        self.pending = {} if pending is None else pending
 
     def set_importers(self, importers: Dict[str, Callable]):
         self.importers = importers
 
+    def cache_info(self) -> CacheInfo:
+        """Hits, misses and evictions of the cache, and the size of cached values (in bytes)."""
+        return self.cache.info() if self.cache else CacheInfo(0, 0, 0, 0, 0)
+
+    def prefetch(self, names: Iterable[str] = None, workers: int = None):
+        """Load the members (all members of this module by default) into the cache in background threads.
+
+        Accessing a member which is being loaded waits for that load only.
+        The number of threads defaults to the `workers` setting.
+        """
+        if not self.cache:
+            raise ValueError('Prefetch requires the cache to be enabled')
+        if names is None:
+            names = [
+                name
+                for name in self.vault.list_children(relative_to=self.path)
+                if self.path + '/' + name in self.vault.archive_for(self.path + '/')
+            ]
+        executor = ThreadPoolExecutor(max_workers=workers or int(self.vault.settings['workers']))
+        for name in names:
+            path = self.path + '/' + name
+            version = self.vault.archive_for(path).member_version(path)
+            if self.cache.holds(path, version) or path in self.pending:
+                continue
+            future = executor.submit(self._prefetch, path, name, version)
+            self.pending[path] = version, future
+            future.add_done_callback(partial(self._prefetched, path))
+        # the submitted loads continue in the background
+        executor.shutdown(wait=False)
+
+    def _prefetch(self, path, key, version: Hashable):
+        value = self._load(path, key)
+        self.cache.put(path, value, version=version)
+        return value
+
+    def _prefetched(self, path, future: Future):
+        self.pending.pop(path, None)
+
+    def _load(self, path, key):
+        importer = self.importers.get(key, None)
+        # TODO: display metadata
+        return self.vault.load_object(path, key, importer, to_globals=False)
+
     def __getattr__(self, key):
-        if key in self.__dir__():
-            if self.cache and key in self.cached:
-                return self.cached[key]
-            importer = self.importers.get(key, None)
-            # TODO: display metadata
-            value = self.vault.load_object(self.path + '/' + key, key, importer, to_globals=False)
+        path = self.path + '/' + key
+        archive = self.vault.archive_for(path)
+        if path in archive:
+            version = archive.member_version(path)
+            if self.cache:
+                value = self.cache.get(path, version=version, default=_MISSING)
+                if value is not _MISSING:
+                    return value
+            pending_version, future = self.pending.get(path, (None, None))
+            if future and pending_version == version and not future.exception():
+                value = future.result()
+            else:
+                value = self._load(path, key)
             if self.cache:
-                self.cached[key] = value
+                self.cache.put(path, value, version=version)
             return value
-        raise AttributeError
+        if self.vault.is_folder(path):
+            return DynamicVault(path=path, vault=self.vault, cache=self.cache, pending=self.pending)
+        raise AttributeError(key)
 
     def __dir__(self):
-        """Make members tab-completable"""
-        return self.vault.list_members(relative_to=self.path)
+        """Make members (and sub-folders) tab-completable"""
+        return self.vault.list_children(relative_to=self.path)
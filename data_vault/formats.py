@@ -0,0 +1,135 @@
+import io
+from typing import BinaryIO
+
+import numpy as np
+from pandas import DataFrame, Series
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class ArrowFormat:
+    """Binary, columnar storage of DataFrames preserving the dtypes (including index, categorical,
+    datetime and nullable columns) using pandas metadata of Arrow tables; requires `pyarrow`."""
+
+    # whether the data can be read from a (non-seekable) decompressed stream
+    streaming = False
+
+    def _ensure_pyarrow(self):
+        if not pyarrow:
+            raise ImportError(f'{self.__class__.__name__} format requires pyarrow; please install it')
+
+    def export(self, value, file_path: str):
+        self._ensure_pyarrow()
+        if isinstance(value, Series):
+            value = value.to_frame()
+        if not isinstance(value, DataFrame):
+            raise TypeError(f'Only DataFrame and Series can be stored in {self.__class__.__name__} format')
+        self._write(pyarrow.Table.from_pandas(value), file_path)
+
+    def load(self, stream: BinaryIO) -> DataFrame:
+        self._ensure_pyarrow()
+        if not self.streaming:
+            # zero-copy access to the content, which needs random access
+            stream = pyarrow.BufferReader(pyarrow.py_buffer(stream.read()))
+        return self._read(stream).to_pandas()
+
+    def map(self, buffer: memoryview) -> DataFrame:
+        """Load from memory-mapped data, without extracting the member first.
+
+        The columns are copied into the DataFrame, as the columns backed by the Arrow buffers would be read-only.
+        """
+        self._ensure_pyarrow()
+        table = self._read(pyarrow.BufferReader(pyarrow.py_buffer(buffer)))
+        return table.to_pandas()
+
+    def _write(self, table, file_path: str):
+        raise NotImplementedError
+
+    def _read(self, stream):
+        raise NotImplementedError
+
+
+class Parquet(ArrowFormat):
+
+    def _write(self, table, file_path):
+        pyarrow.parquet.write_table(table, file_path)
+
+    def _read(self, stream):
+        return pyarrow.parquet.read_table(stream)
+
+
+class Feather(ArrowFormat):
+
+    def _write(self, table, file_path):
+        # the columns are compressed with the rest of the member; compressed buffers could not be memory-mapped
+        pyarrow.feather.write_feather(table, file_path, compression='uncompressed')
+
+    def _read(self, stream):
+        return pyarrow.feather.read_table(stream)
+
+
+class ArrowStream(ArrowFormat):
+    """Arrow IPC streaming format, which can be read as it is being decompressed."""
+
+    streaming = True
+
+    def _write(self, table, file_path):
+        with pyarrow.OSFile(file_path, 'wb') as sink:
+            with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def _read(self, stream):
+        return pyarrow.ipc.open_stream(stream).read_all()
+
+
+class NumpyFormat:
+    """NumPy arrays in the `.npy` format, which can be memory-mapped without copying."""
+
+    def export(self, value: np.ndarray, file_path: str):
+        with open(file_path, 'wb') as f:
+            np.save(f, value, allow_pickle=False)
+
+    def load(self, stream: BinaryIO) -> np.ndarray:
+        return np.lib.format.read_array(stream, allow_pickle=False)
+
+    def map(self, buffer: memoryview) -> np.ndarray:
+        """Create an array backed by the memory-mapped data (pages are read when touched)."""
+        header_stream = io.BytesIO(bytes(buffer[:_npy_header_size(buffer)]))
+        version = np.lib.format.read_magic(header_stream)
+        read_header = (
+            np.lib.format.read_array_header_1_0
+            if version == (1, 0) else
+            np.lib.format.read_array_header_2_0
+        )
+        shape, fortran_order, dtype = read_header(header_stream)
+        return np.ndarray(
+            shape, dtype=dtype, buffer=buffer, offset=header_stream.tell(),
+            order='F' if fortran_order else 'C'
+        )
+
+
+def _npy_header_size(buffer: memoryview) -> int:
+    """Size of the magic string, version and header of the `.npy` data"""
+    major_version = buffer[6]
+    if major_version == 1:
+        return 10 + int.from_bytes(buffer[8:10], 'little')
+    return 12 + int.from_bytes(buffer[8:12], 'little')
+
+
+# 'csv' (tab-separated text) is handled by the Vault itself
+binary_formats = {
+    'parquet': Parquet(),
+    'feather': Feather(),
+    'arrow': ArrowStream()
+}
+
+# formats chosen by the type of the value, regardless of the format setting
+array_formats = {
+    'npy': NumpyFormat()
+}
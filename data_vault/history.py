@@ -0,0 +1,183 @@
+import gzip
+import json
+import os
+import sqlite3
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+from .parsing import clean_line, unquote
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY,
+    action TEXT,
+    command TEXT,
+    started TEXT,
+    finished TEXT,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS subjects (
+    operation INTEGER REFERENCES operations(id),
+    path TEXT,
+    subject TEXT,
+    crc32 TEXT,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS subjects_by_path ON subjects(path, operation);
+CREATE INDEX IF NOT EXISTS operations_by_time ON operations(finished);
+CREATE TABLE IF NOT EXISTS imported_logs (
+    path TEXT PRIMARY KEY
+);
+"""
+
+
+class History:
+    """Operations performed on the vault, stored in an SQLite database indexed by the paths of the members
+    and by the time, so that the history of a member (or module) can be queried without reading all the logs.
+
+    Each operation is stored with its full metadata (as in the logs), and with a row for each of its results
+    (the member path, the variable name and the checksums), which is what the queries search for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # the records may be written from a background thread
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def record(self, *operations: Dict):
+        """Store the metadata of the operations (as recorded in the logs) in a single transaction.
+
+        Operations recorded after the history was closed (e.g. loads of lazily imported variables
+        after `%close_vault`) are stored using a new, short-lived connection.
+        """
+        with self._lock:
+            connection = self._connection or sqlite3.connect(self.path)
+            try:
+                with connection:
+                    for metadata in operations:
+                        self._insert(connection, metadata)
+            finally:
+                if connection is not self._connection:
+                    connection.close()
+
+    @classmethod
+    def _insert(cls, connection: sqlite3.Connection, metadata: Dict):
+        cursor = connection.execute(
+            'INSERT INTO operations (action, command, started, finished, metadata) VALUES (?, ?, ?, ?, ?)',
+            (
+                metadata.get('action'), metadata.get('command'),
+                metadata.get('started'), metadata.get('finished'), json.dumps(metadata)
+            )
+        )
+        connection.executemany(
+            'INSERT INTO subjects (operation, path, subject, crc32, sha256) VALUES (?, ?, ?, ?, ?)',
+            [
+                (
+                    cursor.lastrowid,
+                    result.get('path') or _legacy_path(metadata, result),
+                    result.get('subject'),
+                    *cls._checksums(result)
+                )
+                for result in metadata.get('result', [])
+            ]
+        )
+
+    @staticmethod
+    def _checksums(result: Dict):
+        file = result.get('new_file') or result.get('old_file') or {}
+        return file.get('crc32'), file.get('sha256')
+
+    def query(self, path: str = None, since: str = None) -> List[Dict]:
+        """Find the results of operations on the member (or on all members of the module) at the given path,
+        or of all operations if no path was given, which finished at or after `since` (an ISO timestamp, UTC).
+
+        Returns the results (with the action, command and time of their operations), from the oldest.
+        """
+        conditions = []
+        parameters = []
+        if path is not None:
+            path = path.rstrip('/')
+            # members of the module are in the range between `module/` and `module0` ('0' follows '/'),
+            # which can be found using the index (unlike with LIKE)
+            conditions.append('(subjects.path = ? OR (subjects.path >= ? AND subjects.path < ?))')
+            parameters += [path, path + '/', path + '0']
+        if since is not None:
+            conditions.append('operations.finished >= ?')
+            parameters.append(since)
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT operations.action, operations.command, operations.finished,'
+                ' subjects.path, subjects.subject, subjects.crc32, subjects.sha256'
+                ' FROM subjects JOIN operations ON subjects.operation = operations.id'
+                + (' WHERE ' + ' AND '.join(conditions) if conditions else '')
+                + ' ORDER BY operations.finished, operations.id',
+                parameters
+            ).fetchall()
+        return [
+            dict(zip(['action', 'command', 'finished', 'path', 'subject', 'crc32', 'sha256'], row))
+            for row in rows
+        ]
+
+    def import_logs(self, logs_path: str, gzipped: bool = True) -> Optional[int]:
+        """Import the operations from the JSON lines logs, once; return the number of imported operations,
+        or None if the logs were already imported.
+
+        The logs are marked as imported even if they do not exist (yet), as the operations logged
+        from now on are expected to be recorded in the history as well.
+        """
+        logs_path = os.path.abspath(logs_path)
+        with self._lock:
+            imported = self._connection.execute(
+                'SELECT 1 FROM imported_logs WHERE path = ?', (logs_path,)
+            ).fetchone()
+        if imported:
+            return None
+        operations = list(read_logs(logs_path, gzipped)) if os.path.exists(logs_path) else []
+        with self._lock, self._connection:
+            for metadata in operations:
+                self._insert(self._connection, metadata)
+            self._connection.execute('INSERT INTO imported_logs (path) VALUES (?)', (logs_path,))
+        return len(operations)
+
+
+def _is_quoted(text: str) -> bool:
+    return text.startswith('"') or text.startswith("'")
+
+
+def _legacy_path(metadata: Dict, result: Dict) -> Optional[str]:
+    """Path of the member from a result of older versions, which only recorded the subject.
+
+    The subject of deletions and assertions is the path, but the subject of stores and imports
+    is the variable name, so the path is derived from the command (e.g. `store x in datasets as y`).
+    """
+    subject = result.get('subject')
+    pieces = clean_line(metadata.get('command') or '')
+    arguments = dict(zip(pieces[::2], pieces[1::2]))
+    action = metadata.get('action')
+    if action == 'store' and 'in' in arguments:
+        if _is_quoted(arguments['in']):
+            return unquote(arguments['in'])
+        return arguments['in'] + '/' + arguments.get('as', subject)
+    if action == 'import' and 'from' in arguments:
+        # the variable is imported under the name given with `as`
+        return arguments['from'] + '/' + (arguments['import'] if 'as' in arguments else subject)
+    if action == 'import' and _is_quoted(arguments.get('import', '')):
+        return unquote(arguments['import'])
+    return subject
+
+
+def read_logs(logs_path: str, gzipped: bool = True) -> Iterable[Dict]:
+    opener = (gzip.open if gzipped else open)
+    with opener(logs_path, mode='rt') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,116 @@
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from .timing import Timings
+
+if TYPE_CHECKING:
+    # the vault resolves the lazy variables it is given, thus imports this module
+    from .vault import Vault
+
+# IPython probes for this attribute to detect objects pretending to have every attribute
+_IPYTHON_CANARY = '_ipython_canary_method_should_not_exist_'
+
+
+class LazyVariable:
+    """Placeholder bound in the namespace instead of the imported object, loading the member on first use.
+
+    Once loaded, the placeholder replaces itself in the namespace with the loaded object
+    (unless the variable was re-assigned in the meantime), and records the checksums in the logs.
+    Checks of the type (e.g. `isinstance`) do not trigger the load and see the placeholder
+    (use `resolve` to get the loaded object).
+    """
+
+    __slots__ = ('_vault', '_path', '_name', '_namespace', '_load_arguments', '_value')
+
+    def __init__(self, vault: 'Vault', path: str, name: str, namespace: Dict, **load_arguments):
+        object.__setattr__(self, '_vault', vault)
+        object.__setattr__(self, '_path', path)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_namespace', namespace)
+        object.__setattr__(self, '_load_arguments', load_arguments)
+
+    def _resolve(self):
+        try:
+            return object.__getattribute__(self, '_value')
+        except AttributeError:
+            pass
+        started = datetime.utcnow()
+        with Timings(track_memory=self._vault.settings['track_memory']) as timings:
+            value, checksums = self._vault.read_object(self._path, **self._load_arguments)
+        finished = datetime.utcnow()
+        object.__setattr__(self, '_value', value)
+        if self._namespace.get(self._name) is self:
+            self._namespace[self._name] = value
+        self._vault.log({
+            'action': 'import',
+            'result': [{
+                'path': self._path,
+                'new_file': checksums,
+                'subject': self._name
+            }],
+            'lazy': True,
+            'started': started.isoformat(),
+            'finished': finished.isoformat(),
+            'phases': timings.as_dict(),
+            **({'memory': timings.memory()} if timings.track_memory else {})
+        })
+        return value
+
+    def __getattr__(self, name):
+        if name == _IPYTHON_CANARY:
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._resolve(), name)
+
+    def __dir__(self):
+        return dir(self._resolve())
+
+    def __repr__(self):
+        return repr(self._resolve())
+
+    def __str__(self):
+        return str(self._resolve())
+
+    def __hash__(self):
+        return hash(self._resolve())
+
+    def __bool__(self):
+        return bool(self._resolve())
+
+
+def resolve(value: Any) -> Any:
+    """Get the loaded object if the value is a lazily imported variable (loading it if needed), or the value."""
+    if type(value) is LazyVariable:
+        return value._resolve()
+    return value
+
+
+def _forward(name: str) -> Callable:
+    def method(self, *args, **kwargs):
+        return getattr(self._resolve(), name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+# special methods are looked up on the type (not through __getattr__), so these need to be defined explicitly
+for _name in [
+    '__len__', '__iter__', '__reversed__', '__contains__',
+    '__getitem__', '__setitem__', '__delitem__', '__call__', '__format__',
+    '__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__',
+    '__neg__', '__pos__', '__abs__', '__invert__', '__round__',
+    '__int__', '__float__', '__index__', '__array__',
+    *[
+        template.format(operator)
+        for operator in [
+            'add', 'sub', 'mul', 'matmul', 'truediv', 'floordiv', 'mod', 'divmod', 'pow',
+            'lshift', 'rshift', 'and', 'xor', 'or'
+        ]
+        for template in ['__{}__', '__r{}__']
+    ]
+]:
+    setattr(LazyVariable, _name, _forward(_name))
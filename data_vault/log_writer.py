@@ -0,0 +1,111 @@
+import atexit
+import gzip
+import json
+from threading import Condition, Lock, Thread
+from typing import Dict, List, Optional
+
+from .history import History
+
+
+class LogWriter:
+    """Writes the metadata of the operations to the logs (and to the history) in batches.
+
+    The records are buffered and flushed by a background thread once `max_records` are buffered,
+    or `max_delay` seconds after the oldest buffered record was written; the remaining records are flushed
+    on `close` (e.g. on `%close_vault`), and when the interpreter exits (e.g. on kernel shutdown).
+    Each flush appends a single gzip member (instead of one per record).
+
+    If a flush in the background fails, the records which were not written are kept (to be written
+    on the next flush), and the error is raised on the next `write` or `flush`.
+
+    Records written after `close` (e.g. by a lazily imported variable loaded after `%close_vault`)
+    are flushed immediately.
+    """
+
+    def __init__(
+        self, logs_path: str, gzipped: bool = True, history: History = None,
+        max_records: int = 100, max_delay: float = 1.0
+    ):
+        self.logs_path = logs_path
+        self.gzipped = gzipped
+        self.history = history
+        self.max_records = max_records
+        self.max_delay = max_delay
+        self._buffer: List[Dict] = []
+        # records already written to the logs, but not yet to the history
+        self._unrecorded: List[Dict] = []
+        self._error: Optional[Exception] = None
+        self._closed = False
+        # guards the buffer; the flush lock keeps the order of records between concurrent flushes
+        self._condition = Condition()
+        self._flush_lock = Lock()
+        self._thread = Thread(target=self._run, name='data-vault-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, metadata: Dict):
+        with self._condition:
+            self._buffer.append(metadata)
+            closed = self._closed
+            self._condition.notify()
+        if closed:
+            # the background thread has exited
+            self.flush()
+        else:
+            self._raise_error()
+
+    def flush(self):
+        """Write the buffered records to the logs (and the history)."""
+        self._raise_error()
+        self._flush()
+
+    def _flush(self):
+        with self._flush_lock:
+            with self._condition:
+                records, self._buffer = self._buffer, []
+            if records:
+                try:
+                    opener = (gzip.open if self.gzipped else open)
+                    with opener(self.logs_path, mode='ta+') as f:
+                        f.write(''.join(json.dumps(metadata) + '\n' for metadata in records))
+                except Exception:
+                    with self._condition:
+                        # retried on the next flush, before the records written in the meantime
+                        self._buffer = records + self._buffer
+                    raise
+                self._unrecorded.extend(records)
+            if self.history and self._unrecorded:
+                self.history.record(*self._unrecorded)
+            self._unrecorded = []
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error:
+            raise error
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._buffer or self._closed)
+                # collect more records, for up to `max_delay` after the first one
+                self._condition.wait_for(
+                    lambda: len(self._buffer) >= self.max_records or self._closed,
+                    timeout=self.max_delay
+                )
+                if self._closed:
+                    return
+            try:
+                self._flush()
+            except Exception as e:
+                self._error = e
+
+    def close(self):
+        """Stop the background thread and flush the remaining records."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        atexit.unregister(self.close)
+        self._thread.join()
+        self.flush()
@@ -0,0 +1,75 @@
+import json
+import os
+from datetime import datetime
+from functools import partial
+from tempfile import NamedTemporaryFile
+from typing import Dict, Optional
+
+from .archive import Archive
+from .checksums import calc_checksums
+from .timing import count, phase
+
+MANIFEST_PATH = '.vault/manifest.json'
+
+
+class Manifest:
+    """Checksums, sizes and modification times of the archive members.
+
+    The manifest is kept inside of the archive (under `MANIFEST_PATH`) and is updated
+    together with the members, so that the checksums do not need to be re-calculated
+    by decompressing the members.
+    """
+
+    def __init__(self, entries: Dict[str, Dict] = None, shared: bool = False):
+        self.entries = entries or {}
+        # the entries shared with the cache of the archive are copied before the first change
+        self._shared = shared
+
+    @classmethod
+    def load(cls, archive: Archive) -> 'Manifest':
+        """Load the manifest of the archive; it is decompressed and parsed once for each version
+        of the archive file, and served from the cache of the archive otherwise (see `Archive.cached`)."""
+        if MANIFEST_PATH not in archive:
+            return cls()
+        entries = archive.cached((MANIFEST_PATH, archive.password), partial(cls._read, archive))
+        return cls(entries, shared=True)
+
+    @staticmethod
+    def _read(archive: Archive) -> Dict[str, Dict]:
+        with phase('manifest'), archive.open(MANIFEST_PATH) as f:
+            return json.load(f)['members']
+
+    def _own_entries(self):
+        if self._shared:
+            self.entries = dict(self.entries)
+            self._shared = False
+
+    def get(self, path) -> Optional[Dict]:
+        return self.entries.get(path, None)
+
+    @staticmethod
+    def describe(file_path: str) -> Dict:
+        """Calculate the checksums of a file to be added to the archive, return the manifest entry."""
+        with phase('checksum'), open(file_path, 'rb') as f:
+            checksums = calc_checksums(f, methods=['CRC32', 'SHA256'])
+        count('checksum', os.path.getsize(file_path))
+        return {
+            'crc32': checksums['CRC32'],
+            'sha256': checksums['SHA256'],
+            'size': os.path.getsize(file_path),
+            'mtime': datetime.utcnow().isoformat()
+        }
+
+    def record(self, path, entry: Dict):
+        self._own_entries()
+        self.entries[path] = entry
+
+    def remove(self, path):
+        self._own_entries()
+        self.entries.pop(path, None)
+
+    def dump(self) -> str:
+        """Write the manifest to a temporary file, return path to the file."""
+        with NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump({'members': self.entries}, f, indent=1, sort_keys=True)
+        return f.name
@@ -0,0 +1,68 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class MemberTree:
+    """Prefix tree of the archive members, with a node for each folder.
+
+    Finding a folder costs as much as the number of its parents (the depth);
+    listing a folder costs as much as the number of its children (or descendants).
+    """
+
+    def __init__(self):
+        self.children: Dict[str, 'MemberTree'] = {}
+        # whether there is a member (file) at the path of this node; a node can be both a member and a folder
+        self.is_member = False
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[str]) -> 'MemberTree':
+        tree = cls()
+        for path in paths:
+            tree.add(path)
+        return tree
+
+    @staticmethod
+    def _split(path: Optional[str]) -> List[str]:
+        return [part for part in (path or '').split('/') if part]
+
+    def add(self, path: str):
+        node = self
+        for part in self._split(path):
+            node = node.children.setdefault(part, MemberTree())
+        # entries ending with a slash are folders
+        if not path.endswith('/'):
+            node.is_member = True
+
+    def find(self, path: str) -> Optional['MemberTree']:
+        """Get the node at given path (relative to this node), or None if there is no such member nor folder."""
+        node = self
+        for part in self._split(path):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, path: str):
+        node = self.find(path)
+        return node is not None and node.is_member
+
+    def is_folder(self, path: str) -> bool:
+        node = self.find(path)
+        return node is not None and bool(node.children)
+
+    def members(self, prefix: str = '') -> Iterator[str]:
+        """Yield paths of all members under this node (relative to this node)."""
+        for name, child in self.children.items():
+            path = prefix + name
+            if child.is_member:
+                yield path
+            yield from child.members(prefix=path + '/')
+
+    def list(self, relative_to: str = '') -> List[str]:
+        """List paths of all members in the folder (and its sub-folders), relative to the folder."""
+        node = self.find(relative_to)
+        return list(node.members()) if node else []
+
+    def list_children(self, relative_to: str = '') -> List[str]:
+        """List names of the members and sub-folders directly in the folder."""
+        node = self.find(relative_to)
+        return list(node.children) if node else []
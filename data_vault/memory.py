@@ -1,3 +1,6 @@
+from time import perf_counter
+from typing import Iterable, Iterator
+
 import pandas as pd
 import numpy as np
 
@@ -7,16 +10,91 @@ def mb(x):
     return x / 10**6
 
 
+# ordered from the smallest; at equal size signed types are preferred
+INTEGER_DTYPES = ['int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64']
+NULLABLE_INTEGER_DTYPES = {
+    dtype: dtype.replace('uint', 'UInt').replace('int', 'Int')
+    for dtype in INTEGER_DTYPES
+}
+
+
+def smallest_integer_dtype(minimum, maximum, nullable=False):
+    """Find the smallest integer dtype which can hold values in the given range."""
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            return NULLABLE_INTEGER_DTYPES[dtype] if nullable else dtype
+    return None
+
+
+def _downcast_integers(s: pd.Series, nullable: bool):
+    minimum, maximum = s.min(), s.max()
+    if pd.isnull(minimum):
+        return s
+    dtype = smallest_integer_dtype(minimum, maximum, nullable=nullable)
+    if dtype and dtype != s.dtype.name:
+        return s.astype(dtype)
+    return s
+
+
+def _downcast_floats(s: pd.Series, float_tolerance, nullable_integers: bool):
+    non_null = s.dropna()
+    if nullable_integers and len(non_null) and len(non_null) != len(s):
+        # integer values with missing data (e.g. parsed from text) can use nullable integers
+        if np.isfinite(non_null).all() and (non_null == np.round(non_null)).all():
+            dtype = smallest_integer_dtype(non_null.min(), non_null.max(), nullable=True)
+            if dtype:
+                return s.astype(dtype)
+    if float_tolerance is not None and s.dtype != np.float32:
+        downcasted = s.astype(np.float32)
+        if np.allclose(s, downcasted, rtol=float_tolerance, atol=0, equal_nan=True):
+            return downcasted
+    return s
+
+
+def _categorise(s: pd.Series, column, categorical_threshold):
+    """Convert to categorical if the ratio of distinct values to all values is below the threshold,
+    or return None if it is not."""
+    # a single pass over the column, as counting the distinct values (`nunique`) finds these anyway
+    values = s.dropna().unique()
+    if len(values) / len(s) >= categorical_threshold:
+        return None
+
+    try:
+        sorted_categories = sorted(values)
+        ordered = True
+    except TypeError as e:
+        sorted_categories = None
+        ordered = False
+        print(f'Not sorting categories for {column}: {e}')
+    return pd.Categorical(s, categories=sorted_categories, ordered=ordered)
+
+
 def optimize_memory(
     df: pd.DataFrame,
     categorical_threshold=0.2,
     categorise_numbers=False,
     categorise_booleans=False,
     inplace=True,
-    report=True
+    report=True,
+    float_tolerance=None,
+    nullable_integers=False,
+    downcast_numbers=True
 ):
+    """Reduce memory usage of the DataFrame by:
+    - downcasting integers to the smallest (signed, unsigned or nullable) integer type which fits the values,
+    - converting floats with integer values and missing data to nullable integers (if `nullable_integers`),
+    - downcasting floats to float32 if the values are within `float_tolerance` (relative; disabled if None),
+    - converting columns with few distinct values (below `categorical_threshold` of all values) to categories
+      (for numbers and booleans only if `categorise_numbers` or `categorise_booleans` respectively).
 
-    before = df.memory_usage(index=True, deep=True).sum()
+    The numbers are only converted (downcast, or to nullable integers) if `downcast_numbers` is True.
+
+    If `report` is True, the per-column and total memory usage before and after,
+    and the time taken are printed out.
+    """
+    started = perf_counter()
+    before = df.memory_usage(index=True, deep=True)
 
     if not inplace:
         df = df.copy()
@@ -24,40 +102,93 @@ def optimize_memory(
     for column in df.columns:
         s = df[column]
 
-        if s.dtype.name == 'category':
+        if s.dtype.name == 'category' or not len(s):
             continue
 
-        if np.issubdtype(s.dtype, np.integer):
-            if s.min() >= -125 and s.max() < 125 and not s.isnull().any():
-                df[column] = s.astype('int8')
-                continue
+        optimized = s
 
-        # attempt to categorise
-        values = set(s)
+        if downcast_numbers and pd.api.types.is_integer_dtype(s.dtype):
+            optimized = _downcast_integers(s, nullable=pd.api.types.is_extension_array_dtype(s.dtype))
+        elif downcast_numbers and pd.api.types.is_float_dtype(s.dtype):
+            optimized = _downcast_floats(s, float_tolerance=float_tolerance, nullable_integers=nullable_integers)
 
-        if np.issubdtype(s.dtype, np.number) and not categorise_numbers:
-            continue
+        is_boolean = pd.api.types.is_bool_dtype(s.dtype)
+        is_number = pd.api.types.is_numeric_dtype(s.dtype) and not is_boolean
 
-        if np.issubdtype(s.dtype, np.bool_) and not categorise_booleans:
-            continue
+        if (not is_number or categorise_numbers) and (not is_boolean or categorise_booleans):
+            categorical = _categorise(optimized, column, categorical_threshold)
+            if categorical is not None:
+                optimized = categorical
 
-        if len(values) / len(s) < categorical_threshold:
-            try:
-                sorted_categories = sorted([v for v in values if not pd.isnull(v)])
-                ordered = True
-            except TypeError as e:
-                sorted_categories = None
-                ordered = False
-                print(f'Not sorting categories for {column}: {e}')
-            df[column] = pd.Categorical(s, categories=sorted_categories, ordered=ordered)
+        if optimized is not s:
+            df[column] = optimized
 
-    after = df.memory_usage(deep=True).sum()
+    after = df.memory_usage(index=True, deep=True)
 
     if report:
-        percent = (before - after) / before * 100
+        elapsed = perf_counter() - started
+        for column in df.columns:
+            if before[column] != after[column]:
+                print(f' - {column}: {mb(before[column]):.2f} MB → {mb(after[column]):.2f} MB ({df[column].dtype})')
+        percent = (before.sum() - after.sum()) / before.sum() * 100
         print(
             f'Reduced memory usage by {percent:.2f}%,'
-            f' from {mb(before):.2f} MB to {mb(after):.2f} MB.'
+            f' from {mb(before.sum()):.2f} MB to {mb(after.sum()):.2f} MB'
+            f' in {elapsed:.2f} seconds.'
         )
 
     return df
+
+
+def optimize_chunks(chunks: Iterable[pd.DataFrame], **kwargs) -> Iterator[pd.DataFrame]:
+    """Optimize memory of consecutive chunks of a DataFrame, keeping the dtypes consistent.
+
+    Columns to categorise are chosen based on the first chunk; categories of each
+    following chunk extend the categories of the previous chunks.
+
+    Numbers are not downcast, as the smallest dtype which fits the values of all chunks
+    is not known until all are read; downcast these once the chunks are concatenated instead.
+    """
+    categorical_dtypes = None
+
+    for chunk in chunks:
+        if categorical_dtypes is None:
+            chunk = optimize_memory(chunk, **{**kwargs, 'downcast_numbers': False})
+            categorical_dtypes = {
+                column: dtype
+                for column, dtype in chunk.dtypes.items()
+                if dtype.name == 'category'
+            }
+        else:
+            for column, dtype in categorical_dtypes.items():
+                values = chunk[column]
+                new_categories = pd.Index(values.dropna().unique())
+                new_categories = new_categories[~new_categories.isin(dtype.categories)]
+                if len(new_categories):
+                    categories = dtype.categories.append(new_categories)
+                    if dtype.ordered:
+                        categories = categories.sort_values()
+                    dtype = categorical_dtypes[column] = pd.CategoricalDtype(categories, ordered=dtype.ordered)
+                chunk[column] = pd.Categorical(values, dtype=dtype)
+        yield chunk
+
+
+def concat_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate chunks of a DataFrame, unifying categories so that the categorical columns stay categorical."""
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+
+    for column, dtype in chunks[-1].dtypes.items():
+        dtypes = [chunk[column].dtype for chunk in chunks]
+        if dtype.name != 'category' or any(other.name != 'category' for other in dtypes):
+            continue
+        categories = dtypes[0].categories
+        for other in dtypes[1:]:
+            categories = categories.append(other.categories[~other.categories.isin(categories)])
+        if dtype.ordered:
+            categories = categories.sort_values()
+        for chunk in chunks:
+            chunk[column] = chunk[column].cat.set_categories(categories)
+
+    return pd.concat(chunks)
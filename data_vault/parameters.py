@@ -1,3 +1,6 @@
+from datetime import datetime
+
+from .compression import validate_compression
 from .frames import frame_manager
 from .parsing import split_variables, unquote
 
@@ -68,6 +71,26 @@ class ParametersValidator:
             assert v.isidentifier()
         return True
 
+    def positive_integer(self, param: str):
+        """Integer greater than zero"""
+        assert int(param) > 0
+        return True
+
+    def timestamp(self, param: str):
+        """Date or date and time in ISO format (UTC), e.g. 2024-01-31 or 2024-01-31T12:00"""
+        datetime.fromisoformat(param)
+        return True
+
+    def compression(self, param: str):
+        """Compression method (stored, deflated, bzip2, lzma or auto) optionally with level, e.g. deflated:9"""
+        validate_compression(param)
+        return True
+
+    def flag(self, param):
+        """Option enabled by using it without a value (or with True/False)"""
+        assert param in {True, 'True', 'False'}
+        return True
+
     def hash_method(self, param: str):
         """Hash method, one of CRC32 or SHA256"""
         assert param in {'CRC32', 'SHA256'}
@@ -42,17 +42,39 @@ def clean_line(line: str) -> str:
     return pieces
 
 
+def short_aliases(defaults):
+    """Map single-letter aliases to the keys of settings.
+
+    The first key starting with a given letter claims the alias;
+    keys added later which share the first letter are only available by the full name.
+    """
+    aliases = {}
+    for key in defaults:
+        aliases.setdefault(key[0], key)
+    return aliases
+
+
+def short_aliases_of_keys(defaults):
+    """List the single-letter alias (or None if not available) for each key of the settings."""
+    aliases = short_aliases(defaults)
+    return [
+        key[0] if aliases[key[0]] == key else None
+        for key in defaults
+    ]
+
+
 def parse_arguments(line, defaults):
     iterable = iter(clean_line(line))
     user_arguments = {key.lstrip('-'): next(iterable) for key in iterable}
 
+    aliases = short_aliases(defaults)
     config = defaults.copy()
     for key in config:
         if key in user_arguments:
             config[key] = bool_or_str(user_arguments[key])
         else:
             short_key = key[0]
-            if short_key in user_arguments:
+            if aliases[short_key] == key and short_key in user_arguments:
                 config[key] = bool_or_str(user_arguments[short_key])
     return config
 
@@ -0,0 +1,271 @@
+import os
+import shutil
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO, Dict, Iterable
+from zipfile import ZipFile, ZipInfo, sizeFileHeader, structFileHeader
+
+from .archive import Archive, CompressedFile
+from .compression import Compression, COMPRESSION_METHODS, compression_of, parse_compression
+from .checksums import calc_checksums, CHUNK_SIZE
+from .timing import count, phase
+
+try:
+    import pyzipper
+except ImportError:
+    pyzipper = None
+
+
+_DATA_DESCRIPTOR_FLAG = 0x08
+_DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+_ZIP64_EXTRA_ID = 0x0001
+_ZIP64_LIMIT = (1 << 31) - 1
+
+
+def _strip_extra(extra: bytes, header_id: int) -> bytes:
+    """Remove records with given header id from the extra field."""
+    stripped = b''
+    i = 0
+    while i + 4 <= len(extra):
+        record_id, size = struct.unpack('<HH', extra[i:i + 4])
+        if record_id != header_id:
+            stripped += extra[i:i + 4 + size]
+        i += 4 + size
+    return stripped
+
+
+class PythonZip(Archive):
+    """In-process archive backend, avoiding the overhead of spawning `7z` processes.
+
+    Unencrypted members are handled with the standard library `zipfile`;
+    encrypted members are written with AES which requires the optional `pyzipper` package
+    (members encrypted with the legacy ZipCrypto, e.g. by `7z`, can be read without it).
+
+    All modifications are written to a temporary file which then replaces the archive;
+    existing members, and files compressed ahead (see `compress`), are copied as raw (compressed and encrypted) bytes.
+    """
+
+    @classmethod
+    def supports_encryption(cls):
+        return pyzipper is not None
+
+    def _zip_file(self, path=None, mode='r', password: str = None) -> ZipFile:
+        path = path or self.path
+        if pyzipper:
+            archive = pyzipper.AESZipFile(path, mode=mode)
+            if password:
+                archive.setpassword(password.encode())
+                archive.setencryption(pyzipper.WZ_AES)
+            return archive
+        if password and mode != 'r':
+            raise ValueError(
+                'Encrypting archive members in-process requires pyzipper;'
+                ' please install it, or use `--backend 7z`.'
+            )
+        archive = ZipFile(path, mode=mode)
+        if password:
+            archive.setpassword(password.encode())
+        return archive
+
+    @contextmanager
+    def open(self, file_path, mode='r', password: str = None):
+        password = self._resolve_password(password)
+        with self._zip_file(password=password) as archive:
+            with archive.open(file_path, mode=mode) as f:
+                yield f
+
+    def calc_checksum(self, file_path: str, method='CRC32', password=None):
+        """Method: CRC32 or one of the algorithms supported by hashlib (e.g. SHA1, SHA256), CRC32 by default.
+        """
+        with self.open(file_path, password=password) as f:
+            return calc_checksums(f, methods=[method])[method]
+
+    def check_integrity(self, *paths: str, password=None):
+        """Decompress given members (or all if no paths were given),
+        verifying their CRC (or HMAC for AES-encrypted members)."""
+        password = self._resolve_password(password)
+        with self._zip_file(password=password) as archive:
+            infos = [archive.getinfo(path) for path in paths] if paths else archive.infolist()
+            for info in infos:
+                if info.is_dir():
+                    continue
+                with archive.open(info) as f:
+                    while f.read(CHUNK_SIZE):
+                        pass
+
+    def update(
+        self, add: Dict[str, str] = None, delete: Iterable[str] = (),
+        rename: Dict[str, str] = None, password=None, compression: Compression = None
+    ):
+        """Apply all changes in a single rewrite of the archive."""
+        add = add or {}
+        rename = rename or {}
+        password = self._resolve_password(password)
+        skipped = set(delete) | set(add)
+
+        directory = Path(self.path).absolute().parent
+        with NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False) as f:
+            temporary_path = f.name
+
+        try:
+            if self.exists():
+                shutil.copymode(self.path, temporary_path)
+            with self._zip_file(temporary_path, mode='w', password=password) as target:
+                if self.exists():
+                    with open(self.path, 'rb') as source, self._zip_file() as archive, phase('copy'):
+                        for info in archive.infolist():
+                            if info.filename in skipped:
+                                continue
+                            self._copy_raw(source, target, info, rename.get(info.filename, info.filename))
+                            count('copy', info.compress_size)
+                self._add(target, add, compression)
+            os.replace(temporary_path, self.path)
+        except Exception:
+            os.remove(temporary_path)
+            raise
+
+    def append(
+        self, add: Dict[str, str] = None, delete: Iterable[str] = (),
+        rename: Dict[str, str] = None, password=None, compression: Compression = None
+    ):
+        """Apply all changes by appending the added (and renamed) members and a new central directory
+        to the end of the archive; the replaced and deleted members, and the previous central directory
+        are left in the file as dead space (see `dead_space` and `compact`).
+
+        The previous size of the archive is recorded (and synced to the disk) before anything is appended;
+        if the append is interrupted, the archive is truncated back to it: immediately if writing fails,
+        or when the archive is opened next if the process was killed (see `_recover`).
+        """
+        if not self.exists():
+            return self.update(add=add, delete=delete, rename=rename, password=password, compression=compression)
+        add = add or {}
+        rename = rename or {}
+        password = self._resolve_password(password)
+        previous_size = os.path.getsize(self.path)
+        with open(self._journal_path, 'w') as journal:
+            journal.write(str(previous_size))
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        try:
+            with open(self.path, 'rb') as source, self._zip_file(mode='a', password=password) as target:
+                # keep the previous central directory intact until the new one is written
+                target.start_dir = previous_size
+                target.fp.seek(previous_size)
+                target._didModify = True
+                with phase('delete'):
+                    for path in delete:
+                        self._forget(target, path)
+                with phase('rename'):
+                    for old_path, new_path in rename.items():
+                        # names in the local header and in the central directory need to match, thus the copy
+                        self._copy_raw(source, target, self._forget(target, old_path), new_path)
+                for path in add:
+                    if path in target.NameToInfo:
+                        self._forget(target, path)
+                self._add(target, add, compression)
+            # the new central directory has to be on the disk before the journal is removed
+            with open(self.path, 'r+b') as f:
+                os.fsync(f.fileno())
+        except Exception:
+            self._recover()
+            raise
+        os.remove(self._journal_path)
+
+    @staticmethod
+    def _forget(target: ZipFile, path: str) -> ZipInfo:
+        """Remove the member from the central directory, leaving its data in the file."""
+        info = target.NameToInfo.pop(path)
+        target.filelist.remove(info)
+        return info
+
+    def compact(self):
+        """Rewrite the archive without the dead space."""
+        # members are copied without decompressing nor decrypting, thus the password is not needed
+        self.update(password=False)
+
+    def _add(self, target: ZipFile, add: Dict[str, str], compression: Compression):
+        with phase('add'):
+            for path_in_archive, file_path in add.items():
+                if isinstance(file_path, CompressedFile):
+                    with open(file_path, 'rb') as source, self._zip_file(file_path) as compressed:
+                        self._copy_raw(source, target, compressed.infolist()[0], path_in_archive)
+                else:
+                    self._write(target, file_path, path_in_archive, compression_of(compression, path_in_archive))
+
+    def compress(
+        self, file_path: str, path_in_archive: str, password=None, compression: str = None
+    ) -> CompressedFile:
+        password = self._resolve_password(password)
+        with NamedTemporaryFile(suffix='.zip', delete=False) as f:
+            compressed_path = CompressedFile(f.name)
+        try:
+            with self._zip_file(compressed_path, mode='w', password=password) as archive:
+                self._write(archive, file_path, path_in_archive, compression)
+        except Exception:
+            os.remove(compressed_path)
+            raise
+        return compressed_path
+
+    @staticmethod
+    def _write(target: ZipFile, file_path: str, path_in_archive: str, compression: str = None):
+        method, level = parse_compression(compression)
+        with phase('compress'):
+            target.write(
+                file_path, arcname=path_in_archive,
+                compress_type=COMPRESSION_METHODS[method], compresslevel=level
+            )
+        count('compress', os.path.getsize(file_path))
+
+    @staticmethod
+    def _copy_raw(source: BinaryIO, target: ZipFile, info: ZipInfo, name: str):
+        """Copy the member without decompressing (nor decrypting) it."""
+        source.seek(info.header_offset)
+        header = struct.unpack(structFileHeader, source.read(sizeFileHeader))
+        filename_length, extra_length = header[10], header[11]
+        source.seek(info.header_offset + sizeFileHeader + filename_length + extra_length)
+        data_size = info.compress_size
+
+        if info.flag_bits & _DATA_DESCRIPTOR_FLAG:
+            source.seek(data_size, os.SEEK_CUR)
+            zip64 = info.compress_size > _ZIP64_LIMIT or info.file_size > _ZIP64_LIMIT
+            descriptor_size = 20 if zip64 else 12
+            if source.read(4) == _DATA_DESCRIPTOR_SIGNATURE:
+                descriptor_size += 4
+            source.seek(-(data_size + 4), os.SEEK_CUR)
+            data_size += descriptor_size
+
+        info.filename = name
+        info.extra = _strip_extra(info.extra, _ZIP64_EXTRA_ID)
+        info.header_offset = target.fp.tell()
+        target.fp.write(info.FileHeader())
+
+        remaining = data_size
+        while remaining:
+            chunk = source.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ValueError(f'Unexpected end of data for {name}')
+            target.fp.write(chunk)
+            remaining -= len(chunk)
+
+        target.filelist.append(info)
+        target.NameToInfo[name] = info
+        target.start_dir = target.fp.tell()
+
+    def add_file(self, file_path: str, password=None, rename: str = False, compression: Compression = None):
+        assert rename is not True
+        self.update(add={rename or Path(file_path).name: file_path}, password=password, compression=compression)
+
+    def add_files(self, files: Dict[str, str], password=None, compression: Compression = None):
+        self.update(add=files, password=password, compression=compression)
+
+    def _add_file(self, file_path: str, password=None, compression: str = None):
+        self.add_file(file_path, password=password, compression=compression)
+
+    def rename(self, old_path: str, new_path: str):
+        self.update(rename={old_path: new_path})
+
+    def delete(self, file_to_remove: str):
+        self.update(delete=[file_to_remove])
@@ -0,0 +1,113 @@
+from typing import Dict, List, Optional
+
+import pandas as pd
+from pandas.api.types import (
+    CategoricalDtype, DatetimeTZDtype, is_datetime64_any_dtype, is_extension_array_dtype
+)
+
+# numpy dtype kinds which read_csv can parse directly: bool, int, unsigned int, float, object
+_PARSABLE_KINDS = set('biufO')
+_PARSABLE_EXTENSIONS = {'Int', 'UInt', 'Float', 'boolean', 'string'}
+_JSON_SCALARS = (str, int, float, bool)
+
+
+def _describe_categories(categories: pd.Index) -> Optional[List]:
+    """Categories as JSON values, or None if these cannot be stored as such (e.g. intervals or periods)."""
+    if is_datetime64_any_dtype(categories):
+        return categories.astype(str).tolist()
+    values = categories.tolist()
+    if categories.dtype.kind not in _PARSABLE_KINDS or not all(isinstance(value, _JSON_SCALARS) for value in values):
+        return None
+    return values
+
+
+def _describe_dtype(dtype) -> Optional[Dict]:
+    if isinstance(dtype, CategoricalDtype):
+        categories = _describe_categories(dtype.categories)
+        if categories is None:
+            return None
+        return {
+            'dtype': 'category',
+            'categories': categories,
+            'categories_dtype': str(dtype.categories.dtype),
+            'ordered': bool(dtype.ordered)
+        }
+    return {'dtype': str(dtype)}
+
+
+def describe_frame(df) -> Optional[Dict]:
+    """Describe dtypes of the columns and of the index, so that tab-separated files
+    can be imported without type inference (and without losing the dtypes).
+
+    Returns None if the frame is not supported (i.e. if it has non-string or duplicated
+    column names, multi-level columns or index, or categories which are not JSON scalars).
+    """
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    if not isinstance(df, pd.DataFrame):
+        return None
+    if isinstance(df.columns, pd.MultiIndex) or isinstance(df.index, pd.MultiIndex):
+        return None
+    if not df.columns.is_unique or not all(isinstance(name, str) for name in df.columns):
+        return None
+    columns = {
+        name: _describe_dtype(dtype)
+        for name, dtype in df.dtypes.items()
+    }
+    index = _describe_dtype(df.index.dtype)
+    if index is None or None in columns.values():
+        return None
+    return {
+        'columns': columns,
+        'index': index
+    }
+
+
+def _to_dtype(description: Dict):
+    if description['dtype'] == 'category':
+        categories = pd.Index(description['categories']).astype(description['categories_dtype'])
+        return CategoricalDtype(categories, ordered=description['ordered'])
+    return pd.api.types.pandas_dtype(description['dtype'])
+
+
+def _is_parsable(dtype) -> bool:
+    if is_extension_array_dtype(dtype):
+        return isinstance(dtype, CategoricalDtype) or any(
+            dtype.name.startswith(prefix)
+            for prefix in _PARSABLE_EXTENSIONS
+        )
+    return dtype.kind in _PARSABLE_KINDS
+
+
+def read_csv_arguments(schema: Dict) -> Dict:
+    """Arguments for `read_csv` parsing the columns directly into the dtypes described by the schema."""
+    dtype = {}
+    parse_dates = []
+    for name, description in schema['columns'].items():
+        column_dtype = _to_dtype(description)
+        if is_datetime64_any_dtype(column_dtype):
+            parse_dates.append(name)
+        elif _is_parsable(column_dtype):
+            dtype[name] = column_dtype
+    return {'dtype': dtype, 'parse_dates': parse_dates}
+
+
+def _restore_dtype(values, dtype):
+    if isinstance(dtype, DatetimeTZDtype):
+        values = pd.to_datetime(values, utc=True)
+        if isinstance(values, pd.Series):
+            return values.dt.tz_convert(dtype.tz)
+        return values.tz_convert(dtype.tz)
+    return values.astype(dtype)
+
+
+def restore_dtypes(df: pd.DataFrame, schema: Dict) -> pd.DataFrame:
+    """Convert the index, and the columns which could not be parsed directly, to the dtypes from the schema."""
+    for name, description in schema['columns'].items():
+        dtype = _to_dtype(description)
+        if df[name].dtype != dtype:
+            df[name] = _restore_dtype(df[name], dtype)
+    index_dtype = _to_dtype(schema['index'])
+    if df.index.dtype != index_dtype:
+        df.index = _restore_dtype(df.index, index_dtype)
+    return df
@@ -1,27 +1,50 @@
 import subprocess
+from collections import defaultdict
 from contextlib import contextmanager
+from itertools import chain
 from pathlib import Path
-from zipfile import ZipFile, ZipInfo
-from io import BytesIO
+from typing import Dict
+from zipfile import ZipFile
 
+from .archive import Archive
+from .python_zip import PythonZip
+from .compression import Compression, compression_of, parse_compression
+from .checksums import CHUNK_SIZE
 
-class SevenZip:
 
-    command = '7z'
+# names of the compression methods (see `COMPRESSION_METHODS`) in the zip format of 7z
+SEVEN_ZIP_METHODS = {
+    'stored': 'Copy',
+    'deflated': 'Deflate',
+    'bzip2': 'BZip2',
+    'lzma': 'LZMA'
+}
+
 
-    def __init__(self, archive_path: str, password=None):
-        self.path = archive_path
-        self.password = password
+class SevenZip(Archive):
+    """Archive backend delegating all operations to the `7z` command line tool."""
+
+    command = '7z'
 
     @contextmanager
     def open(self, file_path, mode='r', password: str = None, use_7z: bool = True):
+        """Stream the decompressed member from the standard output of `7z e`."""
         password = password or self.password
 
         if use_7z:
-            yield BytesIO(self._execute(
-                'e', file_path, '-so', *self._password_arg(password),
-                decode=False, expect_ok_message=False
-            ))
+            command = [self.command, 'e', self.path, file_path, '-so', *self._password_arg(password)]
+            with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+                try:
+                    yield process.stdout
+                except Exception:
+                    process.kill()
+                    raise
+                # drain the pipe so that 7z can finish (and report errors, if any)
+                while process.stdout.read(CHUNK_SIZE):
+                    pass
+                return_code = process.wait()
+                if return_code:
+                    raise subprocess.CalledProcessError(return_code, command)
         else:
             if password:
                 password = password.encode()
@@ -39,29 +62,15 @@ class SevenZip:
             o = o.decode('utf-8')
         return o
 
-    def rename(self, old_path: str, new_path: str):
-        return self._execute('rn', old_path, new_path)
-
-    def exists(self):
-        return Path(self.path).exists()
-
-    def __contains__(self, file_path: str):
-        if not self.exists():
-            return False
-        return file_path in self.list_members()
+    def rename(self, old_path: str, new_path: str, *more_paths: str):
+        """Rename one or more members, given as pairs of old and new paths."""
+        return self._execute('rn', old_path, new_path, *more_paths)
 
     def _password_arg(self, password: str):
-        """Set password argument for given argument:
-        - the password set at initialization if `password` is None,
-        - given `password` if not None,
-        - empty if `password` is `False`
-        """
-        if password is False:
-            return []
-        if password is not None:
+        """Set password argument for given argument (see `_resolve_password`)."""
+        password = self._resolve_password(password)
+        if password:
             return ['-p' + password]
-        if self.password:
-            return ['-p' + self.password]
         return []
 
     def calc_checksum(self, file_path: str, method='CRC32', password=None):
@@ -74,44 +83,52 @@ class SevenZip:
         method_used, hashsum = lines[0].split('for data:')
         return hashsum.strip()
 
-    def check_integrity(self, password=None):
-        return self._execute('t', *self._password_arg(password))
+    def check_integrity(self, *paths: str, password=None):
+        # 7z skips the paths which match no member, instead of reporting these
+        for path in paths:
+            self.get_info(path)
+        return self._execute('t', *paths, *self._password_arg(password))
+
+    @staticmethod
+    def _compression_arg(compression: str = None):
+        method, level = parse_compression(compression)
+        return ['-mm=' + SEVEN_ZIP_METHODS[method]] + ([f'-mx={level}'] if level is not None else [])
 
-    def _add_file(self, file_path: str, password=None):
-        args = ['-y', file_path] + self._password_arg(password)
+    def _add_file(self, file_path: str, password=None, compression: str = None):
+        args = ['-y', file_path] + self._password_arg(password) + self._compression_arg(compression)
         return self._execute('a', *args)
 
-    def add_file(self, file_path: str, password=None, rename: str = False):
-        assert rename is not True
-        if not rename:
-            self._add_file(file_path, password=password)
-        else:
-            added_path_in_archive = Path(file_path).name
-
-            try:
-                self._add_file(file_path, password=password)
-                if rename in self:
-                    self.delete(rename)
-                self.rename(added_path_in_archive, rename)
-            except Exception:
-                self.delete(added_path_in_archive)
-                raise
-
-    def delete(self, file_to_remove: str):
-        return self._execute('d', file_to_remove)
-
-    def get_info(self, path) -> ZipInfo:
-        with ZipFile(self.path) as archive:
-            return archive.getinfo(path)
-
-    def list_members(self, relative_to=''):
-        with ZipFile(self.path) as archive:
-            return [
-                (
-                    member.split(relative_to + '/')[1]
-                    if relative_to else
-                    member
-                )
-                for member in archive.namelist()
-                if member.startswith(relative_to + '/' if relative_to else '')
-            ]
+    def add_files(self, files: Dict[str, str], password=None, compression: Compression = None):
+        """Add all files with a single `7z a` (one per compression method), then replace and rename the members
+        with one `7z d` and one `7z rn`."""
+        names_of_added = {
+            path_in_archive: Path(file_path).name
+            for path_in_archive, file_path in files.items()
+        }
+        assert len(set(names_of_added.values())) == len(files)
+        existing = set(self.namelist())
+
+        files_by_compression = defaultdict(list)
+        for path_in_archive, file_path in files.items():
+            files_by_compression[compression_of(compression, path_in_archive)].append(file_path)
+        try:
+            for method, files_to_add in files_by_compression.items():
+                self._execute('a', '-y', *files_to_add, *self._password_arg(password), *self._compression_arg(method))
+            replaced = [path for path in files if path in existing]
+            if replaced:
+                self.delete(*replaced)
+            self.rename(*chain.from_iterable(
+                (added, path_in_archive)
+                for path_in_archive, added in names_of_added.items()
+            ))
+        except Exception:
+            self.delete(*names_of_added.values())
+            raise
+
+    def compact(self):
+        """Rewrite the archive without the dead space (left by appending with the in-process backend)."""
+        # members are copied without decompressing nor decrypting, thus the password is not needed
+        PythonZip(self.path).update(password=False)
+
+    def delete(self, *files_to_remove: str):
+        return self._execute('d', *files_to_remove)
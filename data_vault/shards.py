@@ -0,0 +1,46 @@
+import json
+import os
+from typing import List
+
+INDEX_FILE = 'index.json'
+# shard for the paths outside of any module (e.g. 'file.tsv'); module names cannot start with a dot
+ROOT_SHARD = '.root'
+
+
+class ShardIndex:
+    """Layout of a sharded vault: a directory with one archive per top-level module,
+    and an index listing the modules (so that the modules can be listed without opening the archives).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def shard_of(path: str) -> str:
+        """Name of the shard (the top-level module) holding the member at given path."""
+        module, separator, rest = path.partition('/')
+        return module if separator else ROOT_SHARD
+
+    def archive_path(self, shard: str) -> str:
+        return os.path.join(self.directory, shard + '.zip')
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def shards(self) -> List[str]:
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path) as f:
+            return json.load(f)['shards']
+
+    def register(self, shard: str):
+        """Add the shard to the index (if not already there)."""
+        shards = self.shards()
+        if shard in shards:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = self.index_path + '.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump({'shards': sorted([*shards, shard])}, f, indent=1)
+        os.replace(temporary_path, self.index_path)
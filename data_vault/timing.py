@@ -0,0 +1,175 @@
+import os
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock, local
+from time import perf_counter
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# the peak of traced memory can be reset for each phase since Python 3.9
+_CAN_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+# timings of the operation being performed in the current context (if any)
+_current: 'ContextVar[Optional[Timings]]' = ContextVar('timings', default=None)
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of the process in bytes (None if it cannot be determined without psutil)."""
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _Frame:
+    """Measurements of a phase in progress."""
+
+    def __init__(self):
+        # duration of the nested phases
+        self.nested = 0.0
+        # peak of the traced memory, in the parts of the phase before the last reset of the peak
+        self.peak = 0
+
+
+class Timings:
+    """Durations (in seconds) and sizes of the data processed (in bytes) of the phases of an operation.
+
+    Repeated phases are summed up, including the phases run concurrently by the workers
+    (thus the total can exceed the wall time of the operation); a phase nested in another phase
+    is not counted towards the outer phase. Use as a context manager to record the phases
+    of the operation performed in the context (see `phase`); the phases run in a process pool are not recorded.
+
+    With `track_memory`, the peak of the memory allocated by Python (above the memory allocated at the start
+    of the phase, measured with tracemalloc) and the change of the resident set size are recorded for each phase
+    (the largest of the repeated phases), and for the entire operation. These are measured for the entire process,
+    thus include the memory allocated by the other threads (e.g. the workers running concurrently).
+    Before Python 3.9 the peak cannot be reset, thus the peak of each phase is the highest one since the operation
+    started (which includes the peaks of the preceding phases).
+    """
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.durations: Dict[str, float] = {}
+        self.sizes: Dict[str, int] = {}
+        self.peaks: Dict[str, int] = {}
+        self.rss_deltas: Dict[str, int] = {}
+        self._lock = Lock()
+        # measurements of the phases in progress in the thread, from the outermost
+        self._local = local()
+        self._tokens = []
+        self._operations = []
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        # the entire operation is measured as an unnamed phase
+        operation = self.phase(None)
+        operation.__enter__()
+        self._operations.append((operation, started_tracing))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        operation, started_tracing = self._operations.pop()
+        operation.__exit__(exc_type, exc_val, exc_tb)
+        if started_tracing:
+            tracemalloc.stop()
+        _current.reset(self._tokens.pop())
+
+    def _stack(self) -> List[_Frame]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def phase(self, name: Optional[str]):
+        stack = self._stack()
+        frame = _Frame()
+        if self.track_memory:
+            start_memory, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            if _CAN_RESET_PEAK:
+                tracemalloc.reset_peak()
+            start_rss = current_rss()
+        stack.append(frame)
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - started
+            stack.pop()
+            if stack:
+                stack[-1].nested += duration
+            peak = rss_delta = None
+            if self.track_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame.peak)
+                if stack:
+                    stack[-1].peak = max(stack[-1].peak, peak)
+                peak -= start_memory
+                rss = current_rss()
+                rss_delta = rss - start_rss if rss is not None and start_rss is not None else None
+            self.record(name, duration=duration - frame.nested, peak=peak, rss_delta=rss_delta)
+
+    def record(self, name: Optional[str], duration: float = 0.0, size: int = None, peak: int = None,
+               rss_delta: int = None):
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + duration
+            if size is not None:
+                self.sizes[name] = self.sizes.get(name, 0) + size
+            if peak is not None:
+                self.peaks[name] = max(self.peaks.get(name, peak), peak)
+            if rss_delta is not None:
+                self.rss_deltas[name] = max(self.rss_deltas.get(name, rss_delta), rss_delta)
+
+    def memory(self) -> Dict[str, int]:
+        """Peak memory and the change of the resident set size for the entire operation (if tracked)."""
+        return {
+            **({'peak_memory': self.peaks[None]} if None in self.peaks else {}),
+            **({'rss_delta': self.rss_deltas[None]} if None in self.rss_deltas else {})
+        }
+
+    def slowest(self) -> Optional[str]:
+        phases = [name for name in self.durations if name is not None]
+        if not phases:
+            return None
+        return max(phases, key=self.durations.get)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                'duration': round(duration, 6),
+                **({'bytes': self.sizes[name]} if name in self.sizes else {}),
+                **({'peak_memory': self.peaks[name]} if name in self.peaks else {}),
+                **({'rss_delta': self.rss_deltas[name]} if name in self.rss_deltas else {})
+            }
+            for name, duration in self.durations.items()
+            if name is not None
+        }
+
+
+@contextmanager
+def phase(name: str):
+    """Record the duration of the phase in the timings of the current operation (if any)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.phase(name):
+        yield
+
+
+def count(name: str, size: int):
+    """Record the size of the data processed in the phase."""
+    timings = _current.get()
+    if timings is not None:
+        timings.record(name, size=size)
@@ -1,89 +1,436 @@
 from tempfile import NamedTemporaryFile
+from functools import partial
 from io import BytesIO
 import os
-import hashlib
-from typing import Dict
-import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
 from warnings import warn
+from zipfile import ZipInfo
 
-from pandas import read_csv
+import numpy as np
+from pandas import DataFrame, read_csv
 
+from .archive import Archive
+from .checksums import ChecksumReader
+from .compression import (
+    AUTO, COMPRESSION_METHODS, DEFAULT_COMPRESSION, choose_compression, parse_compression, validate_compression
+)
+from .formats import array_formats, binary_formats
 from .seven_zip import SevenZip
-from .memory import optimize_memory
+from .python_zip import PythonZip
+from .manifest import Manifest, MANIFEST_PATH
+from .shards import ROOT_SHARD, ShardIndex
+from .memory import optimize_memory, optimize_chunks, concat_chunks
+from .schema import describe_frame, read_csv_arguments, restore_dtypes
 from .frames import frame_manager
+from .lazy import resolve
+from .timing import count, phase
+from .workers import map_in_order, pools
+
+
+def _skip_log(metadata: Dict):
+    pass
 
 
 class Vault:
 
-    def __init__(self, settings: Dict):
+    backends = {
+        '7z': SevenZip,
+        'python': PythonZip
+    }
+
+    integrity_policies = {'member', 'full', 'close', 'deferred'}
+
+    write_modes = {'rewrite', 'append'}
+
+    def __init__(self, settings: Dict, log: Callable[[Dict], None] = None):
+        """Args:
+            settings: settings of the vault (see `VaultMagics.defaults`)
+            log: function recording metadata of operations performed outside of the `%vault` magic
+                 (e.g. deferred loads of lazily imported variables)
+        """
         self.settings = settings
+        self.log = log or _skip_log
+        self.archive_class = self._choose_backend()
+        self.integrity_policy = str(self.settings['integrity'])
+        if self.integrity_policy not in self.integrity_policies and not self.integrity_policy.isdigit():
+            raise ValueError(
+                f'Unknown integrity policy {self.integrity_policy}, choose one of: '
+                + ', '.join(sorted(self.integrity_policies)) + ', or a number of writes'
+            )
+        self.unverified_writes = 0
+        self._archive = None
+        # sharded vaults keep each top-level module in a separate archive (see `archive_for`)
+        self.shard_index = ShardIndex(self.settings['path']) if self.settings['sharded'] else None
+        self._archives: Dict[str, Archive] = {}
+        if self.settings['format'] not in {'csv', *binary_formats}:
+            raise ValueError(
+                f'Unknown format {self.settings["format"]}, choose one of: csv, ' + ', '.join(binary_formats)
+            )
+        if not str(self.settings['workers']).isdigit() or int(self.settings['workers']) < 1:
+            raise ValueError(f'Number of workers has to be a positive integer, got {self.settings["workers"]}')
+        validate_compression(self.settings['compression'])
+        if self.settings['write_mode'] not in self.write_modes:
+            raise ValueError(
+                f'Unknown write mode {self.settings["write_mode"]}, choose one of: '
+                + ', '.join(sorted(self.write_modes))
+            )
+        if self.settings['pool'] not in pools:
+            raise ValueError(f'Unknown pool {self.settings["pool"]}, choose one of: ' + ', '.join(pools))
+
+    def __getstate__(self):
+        # the log function may be not picklable (e.g. when sending the vault to a process pool)
+        return {**self.__dict__, 'log': _skip_log}
+
+    def _choose_backend(self) -> Type[Archive]:
+        backend = self.settings['backend']
+        if backend == 'auto':
+            # the in-process backend needs pyzipper to write encrypted members
+            can_use_python = PythonZip.supports_encryption() or not self.settings['encryption_variable']
+            backend = 'python' if can_use_python else '7z'
+        if backend not in self.backends:
+            raise ValueError(f'Unknown backend {backend}, choose one of: auto, ' + ', '.join(self.backends))
+        return self.backends[backend]
 
     def list_members(self, relative_to=None):
-        return self.archive.list_members(relative_to=relative_to)
+        if not self.shard_index:
+            return self.archive.list_members(relative_to=relative_to)
+        if relative_to:
+            return self.archive_for(relative_to + '/').list_members(relative_to=relative_to)
+        return [
+            path
+            for archive in self.archives()
+            for path in archive.list_members()
+        ]
+
+    def list_children(self, relative_to=None):
+        if not self.shard_index:
+            return self.archive.list_children(relative_to=relative_to)
+        if relative_to:
+            return self.archive_for(relative_to + '/').list_children(relative_to=relative_to)
+        # the modules are known from the index, without opening their archives
+        return [
+            *self.archive_for(ROOT_SHARD).list_children(),
+            *[
+                shard
+                for shard in self.shard_index.shards()
+                if shard != ROOT_SHARD and os.path.exists(self.shard_index.archive_path(shard))
+            ]
+        ]
+
+    def is_folder(self, path) -> bool:
+        return self.archive_for(path + '/').tree.is_folder(path)
+
+    def _value_format(self, value) -> str:
+        """Format used by the default exporter for the value: `npy` for NumPy arrays, or the format setting."""
+        if isinstance(value, np.ndarray):
+            return 'npy'
+        return self.settings['format']
 
     def _default_exporter(self, variable, file_object):
+        data_format = self._value_format(variable)
+        if data_format in array_formats:
+            return array_formats[data_format].export(variable, file_object)
+        if data_format in binary_formats:
+            return binary_formats[data_format].export(variable, file_object)
         # line terminator set to '\n' to have the same hashes between Unix and Windows
         return variable.to_csv(file_object, sep='\t', line_terminator='\n')
 
     @property
-    def archive(self):
-        return SevenZip(
-            archive_path=self.settings['path'],
-            password=self._password
-        )
-
-    def save_object(self, path, value, exporter, **metadata):
-
+    def archive(self) -> Archive:
+        """The archive of this vault, kept for the lifetime of the vault to reuse the index of members."""
+        if self.shard_index:
+            raise ValueError('Sharded vault has an archive for each module, use `archive_for(path)` instead')
+        if not self._archive:
+            self._archive = self.archive_class(
+                archive_path=self.settings['path'],
+                password=self._password
+            )
+        else:
+            self._archive.password = self._password
+        return self._archive
+
+    def archive_for(self, path: str) -> Archive:
+        """The archive holding the member (or folder, if the path ends with a slash) at given path.
+
+        In a sharded vault each top-level module is stored in a separate archive (`<module>.zip`),
+        and the members outside of any module in the root shard (`.root.zip`), all in the vault directory.
+        """
+        if not self.shard_index:
+            return self.archive
+        shard = self.shard_index.shard_of(path)
+        archive = self._archives.get(shard)
+        if not archive:
+            archive = self._archives[shard] = self.archive_class(
+                archive_path=self.shard_index.archive_path(shard),
+                password=self._password
+            )
+        else:
+            archive.password = self._password
+        return archive
+
+    def archives(self) -> List[Archive]:
+        """All existing archives of the vault (one per shard for sharded vaults).
+
+        The shards listed in the index without an archive (e.g. if the process was stopped before
+        the first write to the shard, or the archive was removed) are skipped.
+        """
+        if not self.shard_index:
+            return [self.archive] if self.archive.exists() else []
+        archives = [
+            self.archive_for(shard + '/' if shard != ROOT_SHARD else '')
+            for shard in self.shard_index.shards()
+        ]
+        return [archive for archive in archives if archive.exists()]
+
+    def _export(self, value, exporter) -> str:
+        """Write the value to a temporary file using the exporter, return path to the file."""
+        with NamedTemporaryFile(delete=False) as f:
+            f.close()
+            with phase('export'):
+                try:
+                    try:
+                        exporter(value, f.name)
+                    except AttributeError as e:
+                        # json
+                        if str(e) != "'str' object has no attribute 'write'":
+                            raise
+                        with open(f.name, 'w') as f2:
+                            exporter(value, f2)
+                    except TypeError as e:
+                        # pickle
+                        if str(e) != "file must have a 'write' attribute":
+                            raise
+                        with open(f.name, 'wb') as f2:
+                            exporter(value, f2)
+                except Exception:
+                    os.remove(f.name)
+                    raise
+            count('export', os.path.getsize(f.name))
+        return f.name
+
+    def save_object(self, path, value, exporter, compression: str = None, **metadata):
+        return self.save_objects({path: value}, exporter, {path: metadata}, compression=compression)[0]
+
+    def save_objects(
+        self, values_by_path: Dict[str, Any], exporter=None, metadata_by_path: Dict[str, Dict] = None,
+        compression: str = None
+    ):
+        """Serialize all values first, then commit them to the archive in a single update.
+
+        Values which serialize to the same content as the one already in the archive are
+        not written again (these are marked as `unchanged` in the metadata), unless the dtypes
+        described in the manifest changed, or the member is stored with a different compression method
+        or encryption than requested.
+
+        The compression (the name of the method with optional level, e.g. `deflated:9`, or `auto`)
+        defaults to the compression setting; with `auto` the method is chosen for each value
+        (see `choose_compression`). Members stored without compression (`stored`) can be imported
+        by memory-mapping the archive, if enabled with the `memory_map` setting (see `read_object`).
+
+        In a sharded vault, the values of each module are committed to the archive of the module,
+        and the archives of different modules are updated concurrently.
+
+        Lazily imported variables which were not loaded yet are loaded first (see `LazyVariable`).
+
+        Returns a list of metadata dictionaries (one per value, in the order of `values_by_path`).
+        """
+        values_by_path = {path: resolve(value) for path, value in values_by_path.items()}
+        default_exporter = not exporter
         if not exporter:
             exporter = self._default_exporter
+        save = partial(
+            self._save_to_archive, exporter=exporter, default_exporter=default_exporter,
+            metadata_by_path=metadata_by_path or {}, compression=compression or self.settings['compression']
+        )
+        if not self.shard_index:
+            return save((self.archive, values_by_path))
+
+        values_by_shard = {}
+        for path, value in values_by_path.items():
+            values_by_shard.setdefault(self.shard_index.shard_of(path), {})[path] = value
+        for shard in values_by_shard:
+            self.shard_index.register(shard)
+
+        saved = map_in_order(
+            save,
+            [
+                (self.archive_for(next(iter(values))), values)
+                for values in values_by_shard.values()
+            ],
+            workers=len(values_by_shard)
+        )
+        metadata_by_saved_path = {
+            path: metadata
+            for values, shard_metadata in zip(values_by_shard.values(), saved)
+            for path, metadata in zip(values, shard_metadata)
+        }
+        return [metadata_by_saved_path[path] for path in values_by_path]
+
+    def _save_to_archive(
+        self, item: Tuple[Archive, Dict[str, Any]], exporter, default_exporter: bool,
+        metadata_by_path: Dict[str, Dict], compression: str
+    ) -> List[Dict]:
+        """Save the values to a single archive (see `save_objects`)."""
+        archive, values_by_path = item
+        manifest = Manifest.load(archive)
+
+        old_checksums = {
+            path: (
+                self._checksums(path, archive=archive, manifest=manifest)
+                if path in archive else
+                {'crc32': None, 'sha256': None}
+            )
+            for path in values_by_path
+        }
+        old_storage = {
+            path: (archive.compression_method(path), archive.is_encrypted(path)) if path in archive else None
+            for path in values_by_path
+        }
+        # the format and the schema of the content, as it was described in the manifest
+        old_entries = {
+            path: {**(manifest.get(path) or {}), 'sha256': old_checksums[path]['sha256']}
+            for path in values_by_path
+        }
 
-        old_checksum_crc, old_checksum_sha = None, None
-
-        archive = self.archive
-
-        if path in archive:
-            old_checksum_crc = archive.calc_checksum(path, method='CRC32')
-            old_checksum_sha = archive.calc_checksum(path, method='SHA256')
+        prepared = map_in_order(
+            partial(
+                self._prepare_member, exporter=exporter, default_exporter=default_exporter,
+                archive=archive, compression=compression
+            ),
+            [
+                (path, value, old_entries[path], old_storage[path])
+                for path, value in values_by_path.items()
+            ],
+            **self._pool_arguments()
+        )
 
-        with NamedTemporaryFile(delete=False) as f:
+        new_entries = {}
+        files_by_path = {}
+        for path, (entry, file_path) in zip(values_by_path, prepared):
+            new_entries[path] = entry
+            if file_path:
+                files_by_path[path] = file_path
+                manifest.record(path, entry)
+
+        try:
+            if files_by_path:
+                files_by_path[MANIFEST_PATH] = manifest.dump()
+                self._write_changes(
+                    archive,
+                    add=files_by_path,
+                    compression={
+                        path: new_entries[path]['compression']
+                        for path in values_by_path
+                        if path in files_by_path
+                    }
+                )
+        finally:
+            for file_path in files_by_path.values():
+                os.remove(file_path)
+
+        if files_by_path:
+            self._check_integrity_after_write(archive, list(files_by_path))
+
+        return [
+            {
+                'path': path,
+                'new_file': {
+                    'crc32': new_entries[path]['crc32'],
+                    'sha256': new_entries[path]['sha256']
+                },
+                'old_file': old_checksums[path],
+                **(
+                    {'compression': new_entries[path]['compression']}
+                    if path in files_by_path else
+                    {'unchanged': True}
+                ),
+                **metadata_by_path.get(path, {})
+            }
+            for path in values_by_path
+        ]
+
+    def _prepare_member(
+        self, item: Tuple[str, Any, Dict, Optional[Tuple[int, bool]]], exporter, default_exporter: bool,
+        archive: Archive, compression: str = None
+    ) -> Tuple[Dict, Optional[str]]:
+        """Export the value, describe it and compress it (if supported by the backend) ahead of the archive update.
+
+        Returns the manifest entry and the path of the file to add to the archive,
+        or None instead of the path if neither the content, nor its format and schema recorded in the manifest
+        (e.g. only the dtypes changed), nor the storage (see `_keeps_storage`) changed.
+        """
+        path, value, old_entry, old_storage = item
+        data_format = self._value_format(value) if default_exporter else None
+        file_path = self._export(value, exporter)
+        keep_file = False
+        try:
+            entry = Manifest.describe(file_path)
+            if data_format:
+                entry['format'] = data_format
+            if data_format == 'csv':
+                schema = describe_frame(value)
+                if schema:
+                    entry['schema'] = schema
+            unchanged = all(entry.get(key) == old_entry.get(key) for key in ['sha256', 'format', 'schema'])
+            if unchanged and self._keeps_storage(old_storage, compression):
+                return entry, None
+            if compression == AUTO:
+                with phase('choose_compression'):
+                    compression = choose_compression(file_path)
+            entry['compression'] = compression or DEFAULT_COMPRESSION
+            compressed = archive.compress(file_path, path, compression=entry['compression'])
+            keep_file = compressed is None
+            return entry, compressed or file_path
+        finally:
+            if not keep_file:
+                os.remove(file_path)
+
+    def _keeps_storage(self, storage: Tuple[int, bool], compression: str) -> bool:
+        """Whether the member, stored with given compression method and encryption, is stored as requested.
+
+        With `auto` compression any method is accepted, as it was chosen for the same content.
+        """
+        compress_type, encrypted = storage
+        if encrypted != bool(self._password):
+            return False
+        return compression == AUTO or compress_type == COMPRESSION_METHODS[parse_compression(compression)[0]]
+
+    def _pool_arguments(self):
+        return dict(
+            workers=int(self.settings['workers']),
+            pool=self.settings['pool']
+        )
 
-            try:
-                f.close()
-                try:
-                    exporter(value, f.name)
-                except AttributeError as e:
-                    # json
-                    if str(e) != "'str' object has no attribute 'write'":
-                        raise
-                    with open(f.name, 'w') as f2:
-                        exporter(value, f2)
-                except TypeError as e:
-                    # pickle
-                    if str(e) != "file must have a 'write' attribute":
-                        raise
-                    with open(f.name, 'wb') as f2:
-                        exporter(value, f2)
-                archive.add_file(f.name, rename=path)
-            except Exception as e:
-                raise e
-            finally:
-                os.remove(f.name)
-
-        new_checksum_crc = archive.calc_checksum(path, method='CRC32')
-        new_checksum_sha = archive.calc_checksum(path, method='SHA256')
-        archive.check_integrity()
-
-        return {
-            'new_file': {
-                'crc32': new_checksum_crc,
-                'sha256': new_checksum_sha
-            },
-            'old_file': {
-                'crc32': old_checksum_crc,
-                'sha256': old_checksum_sha
-            },
-            **metadata
-        }
+    def _checksums(self, path, archive: Archive = None, manifest: Manifest = None, verify=False) -> Dict[str, str]:
+        """Get CRC32 and SHA256 checksums of a member.
+
+        Checksums are read from the manifest, unless `verify` is True, or the member
+        is not in the manifest (or it was modified without updating the manifest)
+        in which case these are calculated from the data.
+        """
+        archive = archive or self.archive_for(path)
+        if not verify:
+            manifest = manifest or Manifest.load(archive)
+            entry = manifest.get(path)
+            if entry and self._crc_matches(archive.get_info(path), entry['crc32']):
+                return {'crc32': entry['crc32'], 'sha256': entry['sha256']}
+        with phase('checksum'):
+            return {
+                'crc32': archive.calc_checksum(path, method='CRC32'),
+                'sha256': archive.calc_checksum(path, method='SHA256')
+            }
+
+    def checksum(self, path, method='CRC32', verify=False) -> str:
+        """Get a checksum of a member, using the manifest unless `verify` is True."""
+        if method in {'CRC32', 'SHA256'}:
+            return self._checksums(path, verify=verify)[method.lower()]
+        with phase('checksum'):
+            return self.archive_for(path).calc_checksum(path, method=method)
+
+    @staticmethod
+    def _crc_matches(info: ZipInfo, crc32: str):
+        # CRC is not stored in the central directory for AES-encrypted members
+        return info.CRC == 0 or info.CRC == int(crc32, 16)
 
     @property
     def _password(self):
@@ -95,73 +442,284 @@ class Vault:
             False
         )
 
-    def _default_importer(self, file_object):
+    def _optimize_arguments(self):
+        return dict(
+            categorise_numbers=self.settings['numbers_as_categories'],
+            categorise_booleans=self.settings['booleans_as_categories'],
+            nullable_integers=self.settings['nullable_integers'],
+            report=self.settings['report_memory_gain']
+        )
+
+    def _default_importer(self, file_object, data_format='csv', schema: Dict = None):
+        if data_format in array_formats:
+            return array_formats[data_format].load(file_object)
+        if data_format in binary_formats:
+            # dtypes are preserved by the binary formats, no need for memory optimization
+            return binary_formats[data_format].load(file_object)
+        if schema:
+            # dtypes are known, no need for inference nor memory optimization
+            df = read_csv(file_object, sep='\t', index_col=0, **read_csv_arguments(schema))
+            return restore_dtypes(df, schema)
         df = read_csv(file_object, sep='\t', index_col=0, parse_dates=True)
         if self.settings['optimize_df']:
-            df = optimize_memory(
-                df,
-                categorise_numbers=self.settings['numbers_as_categories'],
-                categorise_booleans=self.settings['booleans_as_categories'],
-                report=self.settings['report_memory_gain']
-            )
+            with phase('optimize_memory'):
+                df = optimize_memory(df, **self._optimize_arguments())
         return df
 
-    def load_object(self, path, variable_name, importer=None, to_globals=True):
-        if not importer:
-            importer = self._default_importer
-
-        archive = self.archive
+    def _read_chunks(self, file_object, entry: Dict, chunksize: int) -> Iterator[DataFrame]:
+        data_format = entry.get('format', 'csv')
+        if data_format != 'csv':
+            raise ValueError(f'Chunked import is not supported for {data_format} format')
+        schema = entry.get('schema')
+        if schema:
+            chunks = read_csv(file_object, sep='\t', index_col=0, chunksize=chunksize, **read_csv_arguments(schema))
+            for chunk in chunks:
+                yield restore_dtypes(chunk, schema)
+            return
+        chunks = read_csv(file_object, sep='\t', index_col=0, chunksize=chunksize, parse_dates=True)
+        if self.settings['optimize_df']:
+            chunks = optimize_chunks(chunks, **{**self._optimize_arguments(), 'report': False})
+        yield from chunks
+
+    def iter_object(self, path, chunksize: int) -> Iterator[DataFrame]:
+        """Yield consecutive chunks (of up to `chunksize` rows) of a tab-separated DataFrame member,
+        parsing the data as it is being decompressed.
+
+        Categorical columns of all chunks share the categories (known from the schema),
+        or the categories of each chunk extend these of the previous chunks (for members without schema);
+        the numbers of members without schema are not downcast (see `optimize_chunks`).
+        """
+        archive = self.archive_for(path)
         info = archive.get_info(path)
+        entry = Manifest.load(archive).get(path) or {}
 
         with archive.open(path) as f:
-            content = f.read()
-            crc_as_int = zlib.crc32(content)
-            new_checksum_crc = hex(crc_as_int)[2:].upper()
-            new_checksum_sha = hashlib.sha256(content).hexdigest().upper()
-            obj = importer(BytesIO(content))
-            if to_globals:
-                frame_manager.get_ipython_globals()[variable_name] = obj
-
-        # check integrity of a single file
-        if info.CRC != crc_as_int:
-            if info.CRC == 0:
+            reader = ChecksumReader(f)
+            yield from self._read_chunks(reader, entry, chunksize)
+            reader.exhaust()
+
+        self._check_crc(info, entry, reader.checksums()['CRC32'])
+
+    def _check_crc(self, info: ZipInfo, entry: Dict, crc32: str):
+        """Check integrity of a single file"""
+        expected_crc = info.CRC
+        if not expected_crc and entry:
+            expected_crc = int(entry['crc32'], 16)
+
+        crc_as_int = int(crc32, 16)
+
+        if expected_crc != crc_as_int:
+            if expected_crc == 0:
                 # https://sourceforge.net/p/sevenzip/discussion/45798/thread/c284a85f3f/
                 warn(
                     'CRC not found, cannot verify integrity (note:'
                     ' this is expected for newer versions of 7zip when using AES encryption)'
                 )
             else:
-                raise ValueError(f'CRC do not match: {info.CRC} { crc_as_int}')
-
-        metadata = {
-            'new_file': {
-                'crc32': new_checksum_crc,
-                'sha256': new_checksum_sha
-            },
-            'subject': variable_name
+                raise ValueError(f'CRC do not match: {expected_crc} {crc_as_int}')
+
+    def read_object(self, path, importer=None, chunksize: int = None) -> Tuple[Any, Dict[str, str]]:
+        """Load the member, calculating its checksums while the data is being imported.
+
+        The default importer reads directly from the decompressed stream; custom importers
+        receive an in-memory copy of the data, as these may need to seek in the file.
+        If `chunksize` is given, the DataFrame is parsed (and its categories optimized) in chunks of up to
+        `chunksize` rows, which are then concatenated; the numbers are downcast after the concatenation,
+        so that the dtypes are the same as without chunks.
+
+        With the `memory_map` setting, uncompressed and unencrypted members in NumPy and Arrow formats
+        are memory-mapped instead (see `_map_object`); the checksums of these are not verified.
+
+        Returns the loaded object and its checksums.
+        """
+        archive = self.archive_for(path)
+        info = archive.get_info(path)
+        entry = Manifest.load(archive).get(path) or {}
+
+        if self.settings['memory_map'] and not importer and not chunksize:
+            mapped = self._map_object(archive, path, entry)
+            if mapped:
+                return mapped
+
+        streaming = not importer
+        if chunksize:
+            if importer:
+                raise ValueError('Chunked import is only supported with the default importer')
+
+            def importer(file_object):
+                df = concat_chunks(self._read_chunks(file_object, entry, chunksize))
+                if self.settings['optimize_df'] and not entry.get('schema'):
+                    # the numbers are downcast once all chunks are read, as in the import without chunks
+                    with phase('optimize_memory'):
+                        df = optimize_memory(df, **{**self._optimize_arguments(), 'categorical_threshold': 0})
+                return df
+
+        elif not importer:
+            data_format = entry.get('format', 'csv')
+
+            def importer(file_object):
+                return self._default_importer(file_object, data_format=data_format, schema=entry.get('schema'))
+
+        with archive.open(path) as f:
+            reader = ChecksumReader(f)
+            # decompression (and checksums) of the data as it is being read are recorded by the reader
+            if streaming:
+                file_object = reader
+            else:
+                with phase('buffer'):
+                    file_object = BytesIO(reader.read())
+            with phase('parse'):
+                obj = importer(file_object)
+            reader.exhaust()
+
+        checksums = reader.checksums()
+
+        self._check_crc(info, entry, checksums['CRC32'])
+
+        return obj, {
+            'crc32': checksums['CRC32'],
+            'sha256': checksums['SHA256']
+        }
+
+    @staticmethod
+    def _map_object(archive: Archive, path, entry: Dict) -> Optional[Tuple[Any, Dict[str, str]]]:
+        """Load the object from the memory-mapped archive, without extracting nor decompressing the member.
+
+        The data is read from the disk (or shared page cache) only when accessed, thus the checksums
+        are not calculated (nor verified), but taken from the manifest; returns None if the member cannot be mapped.
+        """
+        data_format = entry.get('format')
+        mappable_formats = {**array_formats, **binary_formats}
+        if data_format not in mappable_formats:
+            return None
+        with phase('map'):
+            buffer = archive.map(path)
+            if buffer is None:
+                return None
+            obj = mappable_formats[data_format].map(buffer)
+        count('map', len(buffer))
+        return obj, {
+            'crc32': entry['crc32'],
+            'sha256': entry['sha256']
         }
 
+    def load_object(self, path, variable_name, importer=None, to_globals=True, chunksize: int = None):
+        """Load the member (see `load_objects`); return the metadata if `to_globals`, or the object otherwise."""
         if to_globals:
-            return metadata
+            return self.load_objects({path: variable_name}, importer, chunksize=chunksize)[0]
+        obj, checksums = self.read_object(path, importer, chunksize=chunksize)
+        return obj
+
+    def load_objects(self, variables_by_path: Dict[str, str], importer=None, chunksize: int = None) -> List[Dict]:
+        """Load the members into the global namespace under given variable names.
+
+        The members are decompressed and parsed concurrently by the pool of workers
+        (if the `workers` setting is greater than one).
+
+        Returns a list of metadata dictionaries (one per member, in the order of `variables_by_path`).
+        """
+        loaded = map_in_order(
+            partial(self.read_object, importer=importer, chunksize=chunksize),
+            variables_by_path,
+            **self._pool_arguments()
+        )
+        ipython_globals = frame_manager.get_ipython_globals()
+        results = []
+        for (path, variable_name), (obj, checksums) in zip(variables_by_path.items(), loaded):
+            ipython_globals[variable_name] = obj
+            results.append({
+                'path': path,
+                'new_file': checksums,
+                'subject': variable_name
+            })
+        return results
+
+    def _write_changes(self, archive: Archive, **changes):
+        """Update the archive (see `Archive.update`) according to the write mode:
+        - rewrite: rewrite the archive on each change,
+        - append: append the changes to the end of the archive, and compact the archive
+          once the dead space exceeds the `compaction_threshold` (a fraction of the archive size).
+        """
+        if self.settings['write_mode'] == 'append':
+            archive.append(**changes)
+            if self.dead_space_ratio(archive) > float(self.settings['compaction_threshold']):
+                with phase('compact'):
+                    archive.compact()
         else:
-            return obj
+            archive.update(**changes)
+
+    def dead_space_ratio(self, archive: Archive = None) -> float:
+        """Fraction of the archive size (or of the total size of all archives) taken by the superseded data."""
+        archives = [archive] if archive else self.archives()
+        archives = [archive for archive in archives if archive.exists()]
+        size = sum(os.path.getsize(archive.path) for archive in archives)
+        if not size:
+            return 0
+        return sum(archive.dead_space() for archive in archives) / size
+
+    def compact(self) -> int:
+        """Rewrite the archives without the superseded data, return the number of bytes freed."""
+        freed = 0
+        for archive in self.archives():
+            size = os.path.getsize(archive.path)
+            with phase('compact'):
+                archive.compact()
+            freed += size - os.path.getsize(archive.path)
+        return freed
+
+    def _check_integrity_after_write(self, archive: Archive, written_paths: List[str]):
+        """Verify the archive according to the integrity policy:
+        - member: test the members which were just written,
+        - full: test the entire archive after every write,
+        - a number N: test the entire archive every N writes (and on close),
+        - close: test the entire archive on close,
+        - deferred: only when explicitly requested.
+        """
+        policy = self.integrity_policy
+        self.unverified_writes += 1
+        if policy == 'member':
+            with phase('integrity'):
+                archive.check_integrity(*written_paths)
+            self.unverified_writes = 0
+        elif policy == 'full' or (policy.isdigit() and self.unverified_writes >= int(policy)):
+            self.check_integrity(archive=archive)
+
+    def check_integrity(self, *paths: str, archive: Archive = None):
+        """Test given members, or the entire archive (all archives of a sharded vault) if no paths were given."""
+        with phase('integrity'):
+            if archive:
+                archive.check_integrity(*paths)
+            elif paths:
+                for path in paths:
+                    self.archive_for(path).check_integrity(path)
+            else:
+                for archive in self.archives():
+                    archive.check_integrity()
+        if not paths:
+            self.unverified_writes = 0
 
-    def check_integrity(self):
-        self.archive.check_integrity()
+    def close(self):
+        """Run the pending integrity checks (if any) according to the integrity policy."""
+        if self.unverified_writes and self.integrity_policy not in {'deferred', 'full'}:
+            self.check_integrity()
 
     def remove_object(self, path):
 
-        archive = self.archive
+        archive = self.archive_for(path)
+        manifest = Manifest.load(archive)
+
+        old_checksums = self._checksums(path, archive=archive, manifest=manifest)
 
-        old_checksum_crc = archive.calc_checksum(path, method='CRC32')
-        old_checksum_sha = archive.calc_checksum(path, method='SHA256')
+        manifest.remove(path)
+        manifest_file = manifest.dump()
+        try:
+            self._write_changes(archive, delete=[path], add={MANIFEST_PATH: manifest_file})
+        finally:
+            os.remove(manifest_file)
 
-        archive.delete(path)
+        self._check_integrity_after_write(archive, [MANIFEST_PATH])
 
         return [{
-            'old_file': {
-                'crc32': old_checksum_crc,
-                'sha256': old_checksum_sha
-            },
+            'old_file': old_checksums,
             'subject': path
         }]
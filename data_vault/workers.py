@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextvars import copy_context
+from typing import Callable, Iterable, List
+
+pools = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor
+}
+
+
+def map_in_order(function: Callable, items: Iterable, workers: int = 1, pool: str = 'thread') -> List:
+    """Apply the function to the items using a pool of up to `workers` workers,
+    return the results in the order of the items.
+
+    With a single worker (or a single item) the function is applied in the current thread;
+    the process pool requires the function, the items and the results to be picklable.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    with pools[pool](max_workers=min(workers, len(items))) as executor:
+        if pool == 'thread':
+            # the threads see the context of the caller (e.g. the timings of the current command)
+            futures = [executor.submit(copy_context().run, function, item) for item in items]
+        else:
+            futures = [executor.submit(function, item) for item in items]
+        return [future.result() for future in futures]
@@ -39,4 +39,8 @@ if __name__ == '__main__':
         install_requires=[
             'pandas', 'IPython'
         ],
+        extras_require={
+            'encryption': ['pyzipper'],
+            'arrow': ['pyarrow']
+        },
     )
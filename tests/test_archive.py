@@ -0,0 +1,207 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from zipfile import BadZipFile, ZipFile, ZIP_BZIP2, ZIP_DEFLATED, ZIP_STORED
+
+from pytest import mark, raises
+
+import data_vault
+from data_vault.python_zip import PythonZip
+from data_vault.seven_zip import SevenZip
+
+requires_7z = mark.skipif(not shutil.which('7z'), reason='7z is not installed')
+
+
+def write_file(path, content: bytes):
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+
+@mark.parametrize('password', [False, 'a_strong_password'])
+def test_python_zip_update(tmpdir, password):
+    archive = PythonZip(f'{tmpdir}/archive.zip', password=password)
+    assert 'frames/x' not in archive
+
+    archive.add_file(write_file(tmpdir / 'x', b'x\t1\n' * 100), rename='frames/x')
+    archive.add_file(write_file(tmpdir / 'y', b'y\t2\n' * 100), rename='frames/y')
+    assert archive.list_members(relative_to='frames') == ['x', 'y']
+
+    # replacing keeps the other members intact
+    archive.add_file(write_file(tmpdir / 'x', b'x\t3\n' * 100), rename='frames/x')
+    assert set(archive.list_members()) == {'frames/x', 'frames/y'}
+    with archive.open('frames/x') as f:
+        assert f.read() == b'x\t3\n' * 100
+    with archive.open('frames/y') as f:
+        assert f.read() == b'y\t2\n' * 100
+
+    archive.rename('frames/y', 'frames/z')
+    archive.delete('frames/x')
+    assert archive.list_members() == ['frames/z']
+    with archive.open('frames/z') as f:
+        assert f.read() == b'y\t2\n' * 100
+
+    assert archive.calc_checksum('frames/z') == '98B3667E'
+    assert archive.calc_checksum('frames/z', method='SHA256') == (
+        '0C528AC3B7AC06A71762A92D2AE0E2AAAEEFCE30B1C5D3B39D90A59FC7CAE18E'
+    )
+    archive.check_integrity()
+
+
+def test_python_zip_encryption(tmpdir):
+    archive = PythonZip(f'{tmpdir}/archive.zip', password='a_strong_password')
+    archive.add_file(write_file(tmpdir / 'x', b'secret'), rename='x')
+
+    with raises(RuntimeError, match="File 'x' is encrypted, password required for extraction"):
+        with ZipFile(archive.path) as zip_file:
+            zip_file.read('x')
+
+    with raises(RuntimeError, match='Bad password'):
+        archive.calc_checksum('x', password='wrong_password')
+
+
+def test_index(tmpdir):
+    archive = PythonZip(f'{tmpdir}/archive.zip')
+    assert archive.index == {}
+    with raises(KeyError, match="There is no item named 'x' in the archive"):
+        archive.get_info('x')
+
+    archive.add_file(write_file(tmpdir / 'x', b'x'), rename='x')
+    index = archive.index
+    assert list(index) == ['x']
+    assert archive.get_info('x').file_size == 1
+
+    # the central directory is not parsed again unless the archive changes
+    assert archive.index is index
+
+    # changes made by other processes (or archive objects) are detected
+    PythonZip(archive.path).add_file(write_file(tmpdir / 'y', b'y'), rename='y')
+    assert archive.index is not index
+    assert 'y' in archive
+    assert archive.namelist() == ['x', 'y']
+
+
+@mark.parametrize('password', [False, 'a_strong_password'])
+def test_python_zip_append(tmpdir, password):
+    archive = PythonZip(f'{tmpdir}/archive.zip', password=password)
+    archive.append(add={
+        'frames/x': write_file(tmpdir / 'x', b'x\t1\n' * 100),
+        'frames/y': write_file(tmpdir / 'y', b'y\t2\n' * 100)
+    })
+    assert archive.dead_space() == 0
+
+    with open(archive.path, 'rb') as f:
+        initial_content = f.read()
+    archive.append(add={'frames/x': write_file(tmpdir / 'x', b'x\t3\n' * 100)})
+    archive.append(rename={'frames/y': 'frames/z'}, add={'frames/w': write_file(tmpdir / 'w', b'w')})
+    archive.append(delete=['frames/w'])
+
+    # the existing data is not rewritten
+    with open(archive.path, 'rb') as f:
+        assert f.read().startswith(initial_content)
+    assert archive.dead_space() > 0
+    assert set(archive.list_members()) == {'frames/x', 'frames/z'}
+    with archive.open('frames/x') as f:
+        assert f.read() == b'x\t3\n' * 100
+    with archive.open('frames/z') as f:
+        assert f.read() == b'y\t2\n' * 100
+    archive.check_integrity()
+
+    # failed writes leave the archive intact
+    size = os.path.getsize(archive.path)
+    with raises(FileNotFoundError):
+        archive.append(add={'frames/v': str(tmpdir / 'missing')})
+    assert os.path.getsize(archive.path) == size
+    assert set(archive.list_members()) == {'frames/x', 'frames/z'}
+
+    archive.compact()
+    assert archive.dead_space() == 0
+    assert os.path.getsize(archive.path) < size
+    with archive.open('frames/z') as f:
+        assert f.read() == b'y\t2\n' * 100
+    archive.check_integrity()
+
+
+def test_python_zip_append_killed(tmpdir):
+    archive = PythonZip(f'{tmpdir}/archive.zip')
+    archive.append(add={'x': write_file(tmpdir / 'x', b'x' * 100)})
+    size = os.path.getsize(archive.path)
+    large_file = write_file(tmpdir / 'y', os.urandom(70 * 1024))
+
+    # the process is killed after appending the data, before the central directory is written
+    subprocess.run([sys.executable, '-c', f"""
+import os
+from data_vault.python_zip import PythonZip
+
+def add(target, add, compression):
+    with open({large_file!r}, 'rb') as f:
+        target.fp.write(f.read())
+        target.fp.flush()
+    os._exit(1)
+
+archive = PythonZip({archive.path!r})
+archive._add = add
+archive.append(add={{'y': {large_file!r}}})
+"""], cwd=Path(data_vault.__file__).parent.parent, check=False)
+    assert os.path.getsize(archive.path) > size
+    with raises(BadZipFile):
+        ZipFile(archive.path)
+
+    # the archive is restored when opened next
+    archive = PythonZip(archive.path)
+    assert os.path.getsize(archive.path) == size
+    assert archive.list_members() == ['x']
+    archive.check_integrity()
+    assert not os.path.exists(archive.path + '.journal')
+
+
+@requires_7z
+@mark.parametrize('password', [False, 'a_strong_password'])
+def test_seven_zip_add_files(tmpdir, password):
+    archive = SevenZip(f'{tmpdir}/archive.zip', password=password)
+    assert SevenZip._compression_arg('bzip2:9') == ['-mm=BZip2', '-mx=9']
+    assert SevenZip._compression_arg('stored') == ['-mm=Copy']
+
+    archive.add_files(
+        {
+            'frames/x': write_file(tmpdir / 'x', b'x\t1\n' * 100),
+            'frames/y': write_file(tmpdir / 'y', b'y\t2\n' * 100),
+            'frames/z': write_file(tmpdir / 'z', b'z\t3\n' * 100)
+        },
+        compression={'frames/x': 'stored', 'frames/y': 'bzip2:9', 'frames/z': 'stored'}
+    )
+    assert archive.list_members(relative_to='frames') == ['x', 'y', 'z']
+    assert archive.get_info('frames/x').compress_type == ZIP_STORED
+    assert archive.get_info('frames/y').compress_type == ZIP_BZIP2
+
+    # replacing keeps the other members intact
+    archive.add_files({'frames/x': write_file(tmpdir / 'new_x', b'x\t4\n' * 100)}, compression='deflated')
+    assert set(archive.list_members()) == {'frames/x', 'frames/y', 'frames/z'}
+    assert archive.get_info('frames/x').compress_type == ZIP_DEFLATED
+    # the data is streamed from 7z
+    with archive.open('frames/x') as f:
+        assert f.read() == b'x\t4\n' * 100
+    with archive.open('frames/y') as f:
+        assert f.read() == b'y\t2\n' * 100
+
+    assert archive.calc_checksum('frames/z') == PythonZip(archive.path, password=password).calc_checksum('frames/z')
+    archive.check_integrity('frames/x', 'frames/y')
+    archive.check_integrity()
+    with raises(KeyError, match="There is no item named 'frames/w' in the archive"):
+        archive.check_integrity('frames/w')
+
+
+@requires_7z
+def test_seven_zip_compact(tmpdir):
+    PythonZip(f'{tmpdir}/archive.zip').append(add={'x': write_file(tmpdir / 'x', b'x' * 1000)})
+    PythonZip(f'{tmpdir}/archive.zip').append(add={'x': write_file(tmpdir / 'x', b'y' * 1000)})
+
+    archive = SevenZip(f'{tmpdir}/archive.zip')
+    assert archive.dead_space() > 0
+    archive.compact()
+    assert archive.dead_space() == 0
+    with archive.open('x') as f:
+        assert f.read() == b'y' * 1000
+    archive.check_integrity()
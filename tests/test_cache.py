@@ -0,0 +1,31 @@
+from pandas import DataFrame
+
+from data_vault.cache import LRUCache, measure
+
+
+def test_lru_cache():
+    frame = DataFrame({'a': range(100)})
+    size = measure(frame)
+    cache = LRUCache(max_size=2 * size)
+
+    cache.put('x', frame, version=1)
+    cache.put('y', frame.copy(), version=1)
+    assert cache.get('x', version=1) is frame
+    assert cache.size == 2 * size
+
+    # the least recently used value (y) is evicted
+    cache.put('z', frame.copy(), version=1)
+    assert 'y' not in cache
+    assert cache.get('y', version=1) is None
+
+    # outdated values are not returned
+    assert cache.get('x', version=2) is None
+    assert 'x' not in cache
+
+    # values exceeding the budget are not cached
+    cache.put('large', DataFrame({'a': range(1000)}))
+    assert 'large' not in cache
+
+    info = cache.info()
+    assert (info.hits, info.misses, info.evictions) == (1, 2, 1)
+    assert info.size == size
@@ -0,0 +1,24 @@
+from io import BytesIO
+
+from pandas import read_csv
+
+from data_vault.checksums import ChecksumReader, calc_checksums
+
+
+def test_checksum_reader():
+    content = b'\ta\tb\n0\t1\t1\n1\t1\t2\n'
+    reader = ChecksumReader(BytesIO(content))
+
+    df = read_csv(reader, sep='\t', index_col=0)
+    reader.exhaust()
+
+    assert df.b.tolist() == [1, 2]
+    assert reader.checksums() == calc_checksums(BytesIO(content))
+    assert reader.checksums()['CRC32'] == '3FDAA797'
+
+
+def test_partial_read():
+    reader = ChecksumReader(BytesIO(b'x' * 100))
+    assert reader.read(10) == b'x' * 10
+    reader.exhaust()
+    assert reader.checksums() == calc_checksums(BytesIO(b'x' * 100))
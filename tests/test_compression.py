@@ -0,0 +1,29 @@
+import os
+
+from pytest import raises
+
+from data_vault.compression import choose_compression, parse_compression, validate_compression
+
+
+def test_parse_compression():
+    assert parse_compression(None) == ('deflated', None)
+    assert parse_compression('deflated:9') == ('deflated', 9)
+    assert parse_compression('lzma') == ('lzma', None)
+    validate_compression('auto')
+
+    with raises(ValueError, match='Unknown compression method zstd'):
+        parse_compression('zstd')
+    with raises(ValueError, match='Compression level 9 is not supported for stored'):
+        parse_compression('stored:9')
+
+
+def test_choose_compression(tmpdir):
+    text = tmpdir / 'text.tsv'
+    with open(text, 'w') as f:
+        f.write('name\tvalue\n' + 'a\t1\nb\t2\n' * 10**6)
+    assert choose_compression(str(text)) != 'stored'
+
+    random = tmpdir / 'random.bin'
+    with open(random, 'wb') as f:
+        f.write(os.urandom(2 * 10**6))
+    assert choose_compression(str(random)) == 'stored'
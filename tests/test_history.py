@@ -0,0 +1,78 @@
+import gzip
+import json
+
+from data_vault.history import History
+
+
+def operation(action, path, finished, crc32='0000000A', subject='x'):
+    return {
+        'action': action,
+        'command': f'{action} {path}',
+        'started': finished,
+        'finished': finished,
+        'result': [{'path': path, 'subject': subject, 'new_file': {'crc32': crc32, 'sha256': 'A' * 64}}]
+    }
+
+
+def test_query(tmpdir):
+    history = History(f'{tmpdir}/history.sqlite')
+    history.record(
+        operation('store', 'datasets/salaries', '2024-01-01T10:00:00'),
+        operation('store', 'datasets/salaries_2023', '2024-01-02T10:00:00'),
+        operation('store', 'datasets/salaries', '2024-02-01T10:00:00', crc32='0000000B'),
+        operation('import', 'other/salaries', '2024-02-02T10:00:00')
+    )
+
+    salaries = history.query('datasets/salaries')
+    assert [result['crc32'] for result in salaries] == ['0000000A', '0000000B']
+    assert salaries[-1]['action'] == 'store'
+    assert salaries[-1]['finished'] == '2024-02-01T10:00:00'
+
+    # members of the module, but not of a module with the same prefix
+    assert len(history.query('datasets')) == 3
+    assert len(history.query('data')) == 0
+
+    assert [result['path'] for result in history.query(since='2024-02-01')] == [
+        'datasets/salaries', 'other/salaries'
+    ]
+    assert len(history.query('datasets', since='2024-01-02T10:00:00')) == 2
+    history.close()
+
+
+def legacy_operation(action, command, finished, subject, file='new_file'):
+    """An operation as logged before the path was recorded in the results."""
+    return {
+        'action': action,
+        'command': command,
+        'started': finished,
+        'finished': finished,
+        'result': [{file: {'crc32': '0000000A'}, 'subject': subject}]
+    }
+
+
+def test_import_logs(tmpdir):
+    logs_path = f'{tmpdir}/archive.zip.vault.log.gz'
+    with gzip.open(logs_path, 'wt') as f:
+        for metadata in [
+            legacy_operation('store', 'store salaries in datasets', '2024-01-01T10:00:00', 'salaries'),
+            legacy_operation('store', 'store x in datasets as salaries', '2024-01-02T10:00:00', 'x'),
+            legacy_operation('store', "store x in 'datasets/salaries'", '2024-01-03T10:00:00', 'x'),
+            legacy_operation('import', 'from datasets import salaries', '2024-01-04T10:00:00', 'salaries'),
+            legacy_operation('import', 'from datasets import salaries as y', '2024-01-05T10:00:00', 'y'),
+            legacy_operation('import', "import 'datasets/salaries' as y", '2024-01-06T10:00:00', 'y'),
+            # the subject of deletions is the path
+            legacy_operation(
+                'del', 'del salaries from datasets', '2024-01-07T10:00:00', 'datasets/salaries', file='old_file'
+            )
+        ]:
+            f.write(json.dumps(metadata) + '\n')
+        f.write(json.dumps(operation('store', 'datasets/salaries', '2024-01-08T10:00:00')) + '\n')
+
+    history = History(f'{tmpdir}/history.sqlite')
+    assert history.import_logs(logs_path) == 8
+    # only imported once
+    assert history.import_logs(logs_path) is None
+    results = history.query('datasets/salaries')
+    assert [result['action'] for result in results] == ['store'] * 3 + ['import'] * 3 + ['del', 'store']
+    assert [result['subject'] for result in results[:6]] == ['salaries', 'x', 'x', 'salaries', 'y', 'y']
+    history.close()
@@ -1,14 +1,23 @@
+import gzip
+import json
+import os
+import shutil
 from contextlib import contextmanager
+from mmap import mmap, ALLOCATIONGRANULARITY
+from time import sleep
 from unittest.mock import patch
-from zipfile import ZipFile
+from zipfile import ZipFile, ZIP_BZIP2, ZIP_STORED
 
-from pandas import DataFrame, read_csv
+import numpy as np
+from pandas import DataFrame, Series, Categorical, CategoricalDtype, Index, cut, read_csv, to_datetime
 from pandas.util.testing import assert_frame_equal
-from pytest import raises, fixture, warns, mark
+from pytest import raises, fixture, warns, mark, skip
 from IPython import get_ipython
 
 from data_vault import Vault, parse_arguments, VaultMagics
+from data_vault.actions import StoreAction, ImportAction, HistoryAction
 from data_vault.frames import frame_manager
+from data_vault.manifest import Manifest
 
 
 @contextmanager
@@ -38,6 +47,13 @@ def mock_key(monkeypatch):
     monkeypatch.setenv('KEY', 'a_strong_password')
 
 
+@fixture(params=['python', '7z'])
+def backend(request):
+    if request.param == '7z' and not shutil.which('7z'):
+        skip('7z is not installed')
+    return request.param
+
+
 def test_open_vault_message():
     with raises(Exception, match='Please setup the storage with %open_vault first'):
         ipython.magic('vault del x')
@@ -59,6 +75,19 @@ def test_vault_security_alert(tmpdir):
         assert not record.list
 
 
+def test_open_vault_in_new_directory(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/new/storage/ --secure False --sharded True')
+    x = EXAMPLE_DATA_FRAME
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+    assert os.path.exists(f'{tmpdir}/new/storage/.vault.history.sqlite')
+
+    # invalid settings do not leave the history (or the logs) open
+    with raises(ValueError, match='Unknown integrity policy sometimes'):
+        ipython.magic(f'open_vault --path {tmpdir}/other/archive.zip --secure False --integrity sometimes')
+    assert not os.path.exists(f'{tmpdir}/other')
+
+
 def test_usage_help(tmpdir, mock_key):
     ipython.magic(f'open_vault --path {tmpdir}/archive.zip -e KEY')
     x = EXAMPLE_DATA_FRAME
@@ -97,6 +126,29 @@ def test_store(tmpdir):
         assert x.equals(data)
 
 
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_store_many(tmpdir, mock_key, secure, backend):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --backend {backend}')
+    x = EXAMPLE_DATA_FRAME
+    y = EXAMPLE_DATA_FRAME.assign(c=3)
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip {secure} --backend {backend}', VaultMagics.defaults))
+
+    with patch_ipython_globals(locals()):
+        vault.save_object('my_frames/x', y, None)
+        result = vault.save_objects({'my_frames/x': x, 'my_frames/y': y}, metadata_by_path={'my_frames/y': {'a': 1}})
+
+    assert set(vault.list_members(relative_to='my_frames')) == {'x', 'y'}
+    assert [metadata['old_file']['crc32'] is None for metadata in result] == [False, True]
+    assert result[1]['a'] == 1
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x, y from my_frames')
+    assert_frame_equal(x, namespace['x'], check_dtype=False)
+    assert_frame_equal(y, namespace['y'], check_dtype=False)
+
+
 def test_store_with_encryption(tmpdir, mock_key):
     ipython.magic(f'open_vault --path {tmpdir}/archive.zip -e KEY')
     x = EXAMPLE_DATA_FRAME
@@ -170,8 +222,8 @@ def test_comments_in_magics(tmpdir):
 
 
 @mark.parametrize('secure', ['--secure False', '-e KEY'])
-def test_import_as(tmpdir, mock_key, secure):
-    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure}')
+def test_import_as(tmpdir, mock_key, secure, backend):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --backend {backend}')
     x = EXAMPLE_DATA_FRAME
 
     with patch_ipython_globals(locals()):
@@ -180,6 +232,24 @@ def test_import_as(tmpdir, mock_key, secure):
     with patch_ipython_globals(globals()):
         ipython.magic('vault import x from my_frames as y')
 
+    # dtypes are restored from the schema
+    assert_frame_equal(x, y)
+
+
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_import_without_schema(tmpdir, mock_key, secure):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure}')
+    x = EXAMPLE_DATA_FRAME
+
+    def to_tsv(df, path: str):
+        df.to_csv(path, sep='\t')
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames with to_tsv')
+
+    with patch_ipython_globals(globals()):
+        ipython.magic('vault import x from my_frames as y')
+
     # dtype should be optimized
     assert_frame_equal(x, y, check_dtype=False)
 
@@ -187,9 +257,49 @@ def test_import_as(tmpdir, mock_key, secure):
         assert_frame_equal(x, y)
 
 
+def test_schema(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = DataFrame({
+        'category': Categorical(['a', 'b', 'a'], categories=['b', 'a'], ordered=True),
+        'numeric_category': Categorical([1, 2, 1]),
+        'date': to_datetime(['2020-01-01', '2020-01-02', None]),
+        'date_with_timezone': to_datetime(['2020-01-01', '2020-01-02', '2020-01-03']).tz_localize('Europe/Warsaw'),
+        'nullable': Series([1, None, 3], dtype='Int64'),
+        'small': Series([1, 2, 3], dtype='int8'),
+        'float': Series([0.5, None, 2], dtype='float32'),
+        'flag': [True, False, True],
+        'numeric_text': ['1', '2', '3']
+    }, index=to_datetime(['2021-01-01', '2021-01-02', '2021-01-03']).rename('day'))
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    assert_frame_equal(x, namespace['x'])
+
+
+def test_schema_with_interval_categories(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = DataFrame({'value': [1, 5, 10], 'bin': cut([1, 5, 10], 2)})
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+
+    # categories which cannot be recorded in the manifest are inferred on import
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip --secure False', VaultMagics.defaults))
+    assert 'schema' not in Manifest.load(vault.archive).get('my_frames/x')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    assert namespace['x']['bin'].astype(str).tolist() == x['bin'].astype(str).tolist()
+
+
 @mark.parametrize('secure', ['--secure False', '-e KEY'])
-def test_del(tmpdir, mock_key, secure):
-    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure}')
+def test_del(tmpdir, mock_key, secure, backend):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --backend {backend}')
     x = EXAMPLE_DATA_FRAME
 
     with patch_ipython_globals(locals()):
@@ -223,8 +333,8 @@ def test_exists_after_storage(tmpdir, mock_key, secure):
 
 
 @mark.parametrize('secure', ['--secure False', '-e KEY'])
-def test_assert(tmpdir, mock_key, secure):
-    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure}')
+def test_assert(tmpdir, mock_key, secure, backend):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --backend {backend}')
     x = EXAMPLE_DATA_FRAME
 
     with patch_ipython_globals(locals()):
@@ -238,11 +348,499 @@ def test_assert(tmpdir, mock_key, secure):
 
         ipython.magic('vault assert x in my_frames is 3FDAA797')
         ipython.magic('vault assert x in my_frames is 3FDAA797 with CRC32')
+        ipython.magic('vault assert x in my_frames is 3FDAA797 with CRC32 --verify')
 
         with raises(AssertionError):
             ipython.magic(f'vault assert x in my_frames is {"_" * 64} with SHA256')
 
 
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_manifest(tmpdir, mock_key, secure):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure}')
+    x = EXAMPLE_DATA_FRAME
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip {secure}', VaultMagics.defaults))
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+        ipython.magic('vault store x in my_frames as y')
+
+    manifest = Manifest.load(vault.archive)
+    assert set(manifest.entries) == {'my_frames/x', 'my_frames/y'}
+    assert manifest.get('my_frames/x')['crc32'] == '3FDAA797'
+    assert manifest.get('my_frames/x')['size'] == 17
+    # the manifest is not listed as a member
+    assert vault.list_members() == ['my_frames/x', 'my_frames/y']
+
+    # checksums are served from the manifest, unless verification is requested
+    with patch.object(vault.archive_class, 'calc_checksum', side_effect=AssertionError('Not from manifest')):
+        with patch_ipython_globals(locals()):
+            ipython.magic('vault assert x in my_frames is 3FDAA797')
+            with raises(AssertionError, match='Not from manifest'):
+                ipython.magic('vault assert x in my_frames is 3FDAA797 --verify')
+            ipython.magic('vault del x from my_frames')
+
+    assert set(Manifest.load(vault.archive).entries) == {'my_frames/y'}
+
+
+def test_manifest_cache(tmpdir):
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip --secure False', VaultMagics.defaults))
+    vault.save_objects({'my_frames/x': EXAMPLE_DATA_FRAME, 'my_frames/y': EXAMPLE_DATA_FRAME.assign(c=1)})
+
+    with patch.object(Manifest, '_read', wraps=Manifest._read) as read:
+        vault.checksum('my_frames/x')
+        vault.checksum('my_frames/y', method='SHA256')
+        vault.read_object('my_frames/x')
+        assert read.call_count == 1
+
+        # changes are not visible to the manifests loaded before
+        manifest = Manifest.load(vault.archive)
+        vault.remove_object('my_frames/x')
+        assert set(manifest.entries) == {'my_frames/x', 'my_frames/y'}
+
+        # the manifest is read again once the archive changed
+        assert set(Manifest.load(vault.archive).entries) == {'my_frames/y'}
+        assert read.call_count == 2
+
+
+def test_integrity_policy(tmpdir):
+    archive_path = f'{tmpdir}/archive.zip'
+    archive_class = Vault.backends['python']
+    versions = iter(range(100))
+
+    def count_checks(command):
+        # store a different value each time, so that the store is not skipped as unchanged
+        x = EXAMPLE_DATA_FRAME.assign(version=next(versions))
+        with patch.object(archive_class, 'check_integrity', autospec=True) as check_integrity:
+            with patch_ipython_globals({'x': x}):
+                ipython.magic(command)
+        return [call.args[1:] for call in check_integrity.call_args_list]
+
+    ipython.magic(f'open_vault --path {archive_path} --secure False')
+    # only the written members are tested by default
+    assert count_checks('vault store x in my_frames') == [('my_frames/x', '.vault/manifest.json')]
+
+    ipython.magic(f'open_vault --path {archive_path} --secure False --integrity full')
+    assert count_checks('vault store x in my_frames') == [()]
+
+    ipython.magic(f'open_vault --path {archive_path} --secure False --integrity 2')
+    assert count_checks('vault store x in my_frames') == []
+    assert count_checks('vault store x in my_frames') == [()]
+    assert count_checks('vault store x in my_frames') == []
+    assert count_checks('close_vault') == [()]
+
+    ipython.magic(f'open_vault --path {archive_path} --secure False --integrity deferred')
+    assert count_checks('vault store x in my_frames') == []
+    assert count_checks('close_vault') == []
+
+    with raises(ValueError, match='Unknown integrity policy'):
+        ipython.magic(f'open_vault --path {archive_path} --secure False --integrity sometimes')
+
+
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_store_unchanged(tmpdir, mock_key, secure):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure}')
+    x = EXAMPLE_DATA_FRAME
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip {secure}', VaultMagics.defaults))
+
+    first = vault.save_object('my_frames/x', x, None)
+    assert 'unchanged' not in first
+
+    with patch.object(vault.archive_class, 'add_files', side_effect=AssertionError('Archive modified')):
+        second = vault.save_object('my_frames/x', x.copy(), None)
+    assert second['unchanged']
+    assert second['old_file'] == second['new_file'] == first['new_file']
+
+    action = StoreAction(vault)
+    stamp = action.short_stamp({'result': [{**second, 'subject': 'x'}], 'finished_human_readable': 'today'})
+    assert stamp == 'Stored `x` (unchanged 3FDAA797) at today'
+
+
+def test_store_unchanged_with_new_encryption(tmpdir, mock_key):
+    x = EXAMPLE_DATA_FRAME
+
+    with patch_ipython_globals(locals()):
+        ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+        ipython.magic('vault store x in my_frames')
+        # the same content is written again, as the member is not encrypted
+        ipython.magic(f'open_vault --path {tmpdir}/archive.zip -e KEY')
+        ipython.magic('vault store x in my_frames')
+
+    with raises(RuntimeError, match="File 'my_frames/x' is encrypted, password required for extraction"):
+        with file_from_storage(f'{tmpdir}/archive.zip', 'my_frames/x') as f:
+            f.read()
+    with raises(RuntimeError, match="File '.vault/manifest.json' is encrypted, password required for extraction"):
+        with file_from_storage(f'{tmpdir}/archive.zip', '.vault/manifest.json') as f:
+            f.read()
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip -e KEY', VaultMagics.defaults))
+    assert vault.save_object('my_frames/x', x, None)['unchanged']
+
+
+def test_store_unchanged_with_new_compression(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = np.arange(100)
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_arrays')
+        ipython.magic('vault store x in my_arrays --compression stored')
+
+    with ZipFile(f'{tmpdir}/archive.zip') as archive:
+        assert archive.getinfo('my_arrays/x').compress_type == ZIP_STORED
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip --secure False', VaultMagics.defaults))
+    assert vault.save_object('my_arrays/x', x, None, compression='stored')['unchanged']
+    # the method is chosen for the content with the automatic compression, thus the member is kept
+    assert vault.save_object('my_arrays/x', x, None, compression='auto')['unchanged']
+    assert 'unchanged' not in vault.save_object('my_arrays/x', x, None, compression='bzip2')
+
+
+def test_store_with_new_dtypes(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+
+    # the tab-separated content is the same, but the schema in the manifest is not
+    x = x.astype({'a': 'int8', 'b': 'category'})
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    assert namespace['x'].dtypes.to_dict() == {'a': 'int8', 'b': CategoricalDtype(['x', 'y'])}
+
+
+@mark.parametrize('data_format', ['parquet', 'feather', 'arrow'])
+def test_binary_formats(tmpdir, data_format):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --format {data_format}')
+    x = DataFrame({
+        'category': Categorical(['a', 'b', 'a'], categories=['b', 'a'], ordered=True),
+        'date': to_datetime(['2020-01-01', '2020-01-02', None]),
+        'nullable': Series([1, None, 3], dtype='Int64'),
+        'text': ['x', 'y', 'z']
+    }, index=Index(['i', 'j', 'k'], name='id'))
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+
+    # the format is recorded, so the member can be imported regardless of the current setting
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    assert_frame_equal(x, namespace['x'])
+
+
+def test_import_without_manifest_in_binary_format(tmpdir):
+    # archive written by an older version: a tab-separated member, and no manifest
+    with ZipFile(f'{tmpdir}/archive.zip', mode='w') as archive:
+        archive.writestr('my_frames/x', EXAMPLE_DATA_FRAME.to_csv(sep='\t', line_terminator='\n'))
+
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --format parquet')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+        ipython.magic('vault import x from my_frames as y --chunksize 1')
+    assert_frame_equal(EXAMPLE_DATA_FRAME, namespace['x'], check_dtype=False)
+    assert_frame_equal(EXAMPLE_DATA_FRAME, namespace['y'], check_dtype=False)
+
+
+@mark.parametrize('exporter', ['', 'with to_tsv'])
+def test_import_in_chunks(tmpdir, exporter):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = DataFrame({
+        # new categories appear in the last chunk
+        'text': ['a', 'b'] * 40 + ['c', 'd'] * 5,
+        'number': range(90)
+    })
+
+    def to_tsv(df, path: str):
+        df.to_csv(path, sep='\t')
+
+    with patch_ipython_globals(locals()):
+        ipython.magic(f'vault store x in my_frames {exporter}')
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip --secure False', VaultMagics.defaults))
+    chunks = list(vault.iter_object('my_frames/x', chunksize=20))
+    assert [len(chunk) for chunk in chunks] == [20, 20, 20, 20, 10]
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames --chunksize 20')
+
+    y = namespace['x']
+    assert_frame_equal(x, y, check_dtype=False, check_categorical=False)
+    if exporter:
+        # optimized consistently across chunks
+        assert y.text.dtype == 'category'
+        assert list(y.text.cat.categories) == ['a', 'b', 'c', 'd']
+        assert y.number.dtype == 'int8'
+
+
+def test_nullable_integers(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = DataFrame({'a': [1, None, 3]})
+
+    def to_tsv(df, path: str):
+        df.to_csv(path, sep='\t')
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames with to_tsv')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    assert namespace['x'].a.dtype == 'float64'
+
+    # opt-in, as it changes the dtypes of the imported columns
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --nullable_integers True')
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    assert namespace['x'].a.dtype == 'Int8'
+
+
+def test_import_in_chunks_dtypes(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --nullable_integers True')
+    x = DataFrame({
+        # integer values with missing data in the first chunk only, fractions in the last one
+        'f': [1, None] * 10 + [300.5] * 10,
+        'i': [1] * 20 + [1000] * 10,
+        'text': ['a', 'b'] * 15
+    })
+
+    def to_tsv(df, path: str):
+        df.to_csv(path, sep='\t')
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames with to_tsv')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+        ipython.magic('vault import x from my_frames as y --chunksize 20')
+    assert namespace['x'].dtypes.to_dict() == namespace['y'].dtypes.to_dict()
+    assert namespace['y'].i.dtype == 'int16'
+    assert_frame_equal(namespace['x'], namespace['y'])
+
+
+@mark.parametrize('pool', ['thread', 'process'])
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_workers(tmpdir, mock_key, secure, pool):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --workers 4 --pool {pool}')
+    frames = {
+        name: EXAMPLE_DATA_FRAME.assign(c=i)
+        for i, name in enumerate(['a', 'b', 'c', 'd', 'e'])
+    }
+
+    with patch_ipython_globals(frames):
+        ipython.magic('vault store a, b, c, d, e in my_frames')
+
+    vault = Vault(parse_arguments(
+        f'--path {tmpdir}/archive.zip {secure} --workers 4 --pool {pool}', VaultMagics.defaults
+    ))
+    assert set(vault.list_members(relative_to='my_frames')) == set(frames)
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        result = ImportAction(vault=vault).perform(
+            {'import': 'e, a, c', 'from': 'my_frames'}
+        )
+
+    # results come in the order of the command
+    assert [metadata['subject'] for metadata in result['result']] == ['e', 'a', 'c']
+    for name in ['e', 'a', 'c']:
+        assert_frame_equal(frames[name], namespace[name], check_dtype=False)
+
+    with raises(ValueError, match='Number of workers has to be a positive integer'):
+        Vault(parse_arguments(f'--path {tmpdir}/archive.zip --workers 0', VaultMagics.defaults))
+
+
+@mark.parametrize('data_format', ['arrow', 'feather'])
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_memory_mapped_import(tmpdir, mock_key, secure, data_format):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --format {data_format} --memory_map True')
+    array = np.arange(1000, dtype='float32').reshape(100, 10)
+    fortran_array = np.asfortranarray(array)
+    x = EXAMPLE_DATA_FRAME
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store array, fortran_array, x in my_data --compression stored')
+        ipython.magic('vault store array in compressed')
+
+    with ZipFile(f'{tmpdir}/archive.zip') as archive:
+        if secure == '--secure False':
+            assert archive.getinfo('my_data/array').compress_type == ZIP_STORED
+        assert archive.getinfo('compressed/array').compress_type != ZIP_STORED
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import array, fortran_array, x from my_data')
+        ipython.magic('vault import array from compressed as compressed_array')
+
+    for name in ['array', 'fortran_array', 'compressed_array']:
+        assert (namespace[name] == array).all()
+        assert namespace[name].dtype == array.dtype
+        # the mapped arrays are writable, as the decompressed ones
+        assert namespace[name].flags.writeable
+    # encrypted members are decompressed as usual
+    assert isinstance(namespace['array'].base, mmap) == (secure == '--secure False')
+    if secure == '--secure False':
+        # only the range of the archive holding the member is mapped
+        assert len(namespace['array'].base) < array.nbytes + ALLOCATIONGRANULARITY
+    assert namespace['fortran_array'].flags.f_contiguous
+    assert_frame_equal(namespace['x'], x)
+
+    # the mapping is private: changes of the imported objects do not reach the archive
+    namespace['array'][0, 0] = -1
+    namespace['x'].iloc[0, 0] = -1
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import array, x from my_data')
+    assert (namespace['array'] == array).all()
+    assert_frame_equal(namespace['x'], x)
+
+    # memory-mapping is opt-in
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --format {data_format}')
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import array from my_data')
+    assert not isinstance(namespace['array'].base, mmap)
+    assert (namespace['array'] == array).all()
+
+
+def test_compression(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False -c bzip2:9')
+    x = EXAMPLE_DATA_FRAME
+    noise = np.random.default_rng(0).random(10**5)
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+        ipython.magic('vault store noise in my_arrays --compression auto')
+
+    with ZipFile(f'{tmpdir}/archive.zip') as archive:
+        assert archive.getinfo('my_frames/x').compress_type == ZIP_BZIP2
+        assert archive.getinfo('my_arrays/noise').compress_type == ZIP_STORED
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip', VaultMagics.defaults))
+    manifest = Manifest.load(vault.archive)
+    assert manifest.get('my_frames/x')['compression'] == 'bzip2:9'
+    assert manifest.get('my_arrays/noise')['compression'] == 'stored'
+
+    with raises(ValueError, match='Unknown compression method zstd'):
+        ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --compression zstd')
+
+
+def test_append_mode(tmpdir):
+    ipython.magic(
+        f'open_vault --path {tmpdir}/archive.zip --secure False --write_mode append --compaction_threshold 0.9'
+    )
+    vault = ipython.find_magic('vault').__self__.current_vault
+
+    for i in range(3):
+        x = EXAMPLE_DATA_FRAME.assign(c=i)
+        with patch_ipython_globals(locals()):
+            ipython.magic('vault store x in my_frames')
+    assert vault.dead_space_ratio() > 0
+
+    ipython.magic('vault compact')
+    assert vault.dead_space_ratio() == 0
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    assert_frame_equal(namespace['x'], EXAMPLE_DATA_FRAME.assign(c=2), check_dtype=False)
+
+    # compacted automatically once the dead space exceeds the threshold
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --write_mode append --compaction_threshold 0')
+    vault = ipython.find_magic('vault').__self__.current_vault
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault del x from my_frames')
+    assert vault.dead_space_ratio() == 0
+
+
+def test_import_lazily(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = EXAMPLE_DATA_FRAME
+    y = EXAMPLE_DATA_FRAME.assign(c=1)
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x, y in my_frames')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        read_object = Vault.read_object
+        with patch.object(Vault, 'read_object', autospec=True, side_effect=read_object) as read_object:
+            ipython.magic('vault import x, y from my_frames --lazy')
+            assert read_object.call_count == 0
+
+            lazy_x = namespace['x']
+            # loaded on the first use, and replaced in the namespace
+            assert_frame_equal(lazy_x + 1, x + 1, check_dtype=False)
+            assert namespace['x'] is not lazy_x
+            assert_frame_equal(namespace['x'], x, check_dtype=False)
+            assert len(lazy_x) == len(x)
+            assert read_object.call_count == 1
+
+            assert list(namespace['y'].c) == [1, 1]
+            assert read_object.call_count == 2
+
+        with raises(KeyError, match="There is no item named 'my_frames/z' in the archive"):
+            ipython.magic('vault import z from my_frames --lazy')
+
+    with gzip.open(f'{tmpdir}/archive.zip.vault.log.gz', 'rt') as f:
+        logs = [json.loads(line) for line in f]
+    loads = [entry for entry in logs if entry.get('lazy')]
+    assert [entry['result'][0]['subject'] for entry in loads] == ['x', 'y']
+    assert all(entry['result'][0]['new_file']['crc32'] for entry in loads)
+
+
+@mark.parametrize('data_format', ['csv', 'parquet'])
+def test_store_lazily_imported(tmpdir, data_format):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --format {data_format}')
+    x = EXAMPLE_DATA_FRAME.assign(c=Categorical(['a', 'b']))
+    arr = np.arange(10)
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x, arr in my_frames')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x, arr from my_frames --lazy')
+        # the variables are loaded before being stored (in the format of the loaded objects)
+        ipython.magic('vault store x, arr in other_frames')
+        assert isinstance(namespace['arr'], np.ndarray)
+
+    vault = Vault(parse_arguments(f'--path {tmpdir}/archive.zip --secure False', VaultMagics.defaults))
+    manifest = Manifest.load(vault.archive)
+    assert manifest.get('other_frames/arr')['format'] == 'npy'
+    if data_format == 'csv':
+        assert manifest.get('other_frames/x')['schema'] == manifest.get('my_frames/x')['schema']
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x, arr from other_frames')
+    assert_frame_equal(x, namespace['x'])
+    assert np.array_equal(arr, namespace['arr'])
+
+
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_verify(tmpdir, mock_key, secure, backend):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --backend {backend} --integrity deferred')
+    x = EXAMPLE_DATA_FRAME
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+        ipython.magic('vault verify x in my_frames')
+        ipython.magic('vault verify "my_frames/x"')
+        ipython.magic('vault verify')
+
+        with raises(KeyError, match="There is no item named 'my_frames/y' in the archive"):
+            ipython.magic('vault verify y in my_frames')
+
+
 @mark.parametrize('secure', ['--secure False', '-e KEY'])
 def test_import_module(tmpdir, mock_key, secure):
     ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure}')
@@ -258,3 +856,224 @@ def test_import_module(tmpdir, mock_key, secure):
 
         assert_frame_equal(my_frames.x, x, check_dtype=False)
         assert_frame_equal(my_frames.y, y, check_dtype=False)
+
+        with raises(AttributeError):
+            my_frames.z
+
+        assert my_frames.x is my_frames.x
+        assert my_frames.cache_info().hits == 2
+
+        # members changed in the archive are loaded again
+        x = EXAMPLE_DATA_FRAME.assign(c=1)
+        with patch_ipython_globals({'x': x}):
+            ipython.magic('vault store x in my_frames')
+        assert_frame_equal(my_frames.x, x, check_dtype=False)
+        assert my_frames.cache_info().misses == 3
+
+
+@mark.parametrize('secure', ['--secure False', '-e KEY'])
+def test_import_module_prefetch(tmpdir, mock_key, secure):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip {secure} --workers 2')
+    frames = {
+        name: EXAMPLE_DATA_FRAME.assign(c=i)
+        for i, name in enumerate(['a', 'b', 'c'])
+    }
+
+    with patch_ipython_globals(frames):
+        ipython.magic('vault store a, b, c in my_frames')
+        ipython.magic('vault store a in my_frames/nested')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import my_frames --prefetch')
+        my_frames = namespace['my_frames']
+        for future in [future for version, future in list(my_frames.pending.values())]:
+            future.result()
+
+        assert my_frames.cache_info().size > 0
+        for name, frame in frames.items():
+            assert_frame_equal(getattr(my_frames, name), frame, check_dtype=False)
+        assert my_frames.cache_info().hits == 3
+        assert my_frames.cache_info().misses == 0
+
+
+def test_import_nested_module(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = EXAMPLE_DATA_FRAME
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in datasets')
+        ipython.magic('vault store x in datasets/2024/q1')
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import datasets')
+        datasets = namespace['datasets']
+        assert set(dir(datasets)) == {'x', '2024'}
+        assert dir(getattr(datasets, '2024')) == ['q1']
+        assert_frame_equal(getattr(datasets, '2024').q1.x, x, check_dtype=False)
+
+
+def test_sharded_vault(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/storage --secure False --sharded True --workers 2')
+    vault = ipython.find_magic('vault').__self__.current_vault
+    x = EXAMPLE_DATA_FRAME
+    y = EXAMPLE_DATA_FRAME.assign(c=1)
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+        ipython.magic('vault store x, y in other_frames')
+    vault.save_object('z', x, exporter=None)
+
+    # each module in a separate archive
+    with open(f'{tmpdir}/storage/index.json') as f:
+        assert json.load(f)['shards'] == ['.root', 'my_frames', 'other_frames']
+    with ZipFile(f'{tmpdir}/storage/my_frames.zip') as archive:
+        assert 'my_frames/x' in archive.namelist()
+        assert 'other_frames/x' not in archive.namelist()
+    with ZipFile(f'{tmpdir}/storage/other_frames.zip') as archive:
+        assert {'other_frames/x', 'other_frames/y'} <= set(archive.namelist())
+
+    assert sorted(vault.list_children()) == ['my_frames', 'other_frames', 'z']
+    assert sorted(vault.list_members()) == ['my_frames/x', 'other_frames/x', 'other_frames/y', 'z']
+
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import y from other_frames')
+        ipython.magic('vault import other_frames as frames')
+    assert_frame_equal(namespace['y'], y, check_dtype=False)
+    assert sorted(dir(namespace['frames'])) == ['x', 'y']
+    assert_frame_equal(namespace['frames'].y, y, check_dtype=False)
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault del x from my_frames')
+    assert sorted(vault.list_members()) == ['other_frames/x', 'other_frames/y', 'z']
+    vault.check_integrity()
+
+    # shards listed in the index without an archive (e.g. if the process stopped before the first write)
+    vault.shard_index.register('new_frames')
+    os.remove(f'{tmpdir}/storage/my_frames.zip')
+    assert sorted(vault.list_children()) == ['other_frames', 'z']
+    ipython.magic('vault verify')
+    ipython.magic('vault compact')
+
+
+def test_phase_timings(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = EXAMPLE_DATA_FRAME
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+    # the logs are written in the background, and on close
+    ipython.magic('close_vault')
+
+    with gzip.open(f'{tmpdir}/archive.zip.vault.log.gz', 'rt') as f:
+        store, load = [json.loads(line) for line in f]
+    assert {'arguments', 'export', 'checksum', 'compress', 'add', 'integrity'} <= set(store['phases'])
+    assert {'arguments', 'manifest', 'decompress', 'checksum', 'parse'} <= set(load['phases'])
+    assert store['phases']['export']['bytes'] > 0
+    assert load['phases']['decompress']['bytes'] == store['phases']['export']['bytes']
+
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --allowed_duration 0')
+    with patch_ipython_globals(namespace):
+        with warns(UserWarning, match='longer than the allowed duration of 0 seconds; the slowest phase was'):
+            ipython.magic('vault import x from my_frames')
+
+
+def test_track_memory(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --track_memory True')
+    x = EXAMPLE_DATA_FRAME
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+    namespace = {'read_bytes': lambda f: f.read()}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames with read_bytes')
+    ipython.magic('close_vault')
+
+    with gzip.open(f'{tmpdir}/archive.zip.vault.log.gz', 'rt') as f:
+        store, load = [json.loads(line) for line in f]
+    assert 'peak_memory' in store['phases']['export']
+    assert {'peak_memory', 'rss_delta'} <= set(load['memory'])
+    # the in-memory copy of the data for the custom importer
+    assert load['phases']['buffer']['peak_memory'] > 0
+
+
+def test_history(tmpdir):
+    # operations logged before the history was introduced
+    with gzip.open(f'{tmpdir}/archive.zip.vault.log.gz', 'wt') as f:
+        f.write(json.dumps({
+            'action': 'del',
+            'command': 'vault del x from my_frames',
+            'finished': '2020-01-01T10:00:00',
+            'result': [{'subject': 'my_frames/x', 'old_file': {'crc32': '0000000A'}}]
+        }) + '\n')
+
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False')
+    x = EXAMPLE_DATA_FRAME
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+        ipython.magic('vault store x in other_frames')
+    namespace = {}
+    with patch_ipython_globals(namespace):
+        ipython.magic('vault import x from my_frames')
+
+    short_stamp = HistoryAction.short_stamp
+    # the queries use the history opened with the vault
+    with patch('data_vault.history.sqlite3.connect', side_effect=AssertionError('History opened again')), \
+            patch.object(HistoryAction, 'short_stamp', autospec=True, side_effect=short_stamp) as stamp:
+        ipython.magic('vault history my_frames/x')
+        ipython.magic('vault history my_frames --since 2021-01-01')
+        ipython.magic("vault history 'other_frames/x'")
+        ipython.magic('vault history --since 2021-01-01')
+    results = [call[0][1]['result'] for call in stamp.call_args_list]
+
+    assert [result['action'] for result in results[0]] == ['del', 'store', 'import']
+    assert [result['action'] for result in results[1]] == ['store', 'import']
+    assert results[1][0]['crc32'] == results[1][1]['crc32']
+    assert [result['path'] for result in results[2]] == ['other_frames/x']
+    assert len(results[3]) == 3
+    assert '| store | `my_frames/x` | `x` |' in HistoryAction(vault=None).short_stamp({'result': results[0]})
+
+    # queries are not recorded
+    with gzip.open(f'{tmpdir}/archive.zip.vault.log.gz', 'rt') as f:
+        assert [json.loads(line)['action'] for line in f] == ['del', 'store', 'store', 'import']
+
+
+def test_buffered_logs(tmpdir):
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --logs_flush_interval 0.1')
+    logs_path = f'{tmpdir}/archive.zip.vault.log.gz'
+    x = EXAMPLE_DATA_FRAME
+
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in my_frames')
+        ipython.magic('vault import x from my_frames as y')
+    # written in the background once the interval passes
+    logs = []
+    for _ in range(50):
+        sleep(0.1)
+        if os.path.exists(logs_path):
+            with gzip.open(logs_path, 'rt') as f:
+                logs = [json.loads(line) for line in f]
+        if len(logs) == 2:
+            break
+    assert [entry['action'] for entry in logs] == ['store', 'import']
+
+    # flushed on error
+    ipython.magic(f'open_vault --path {tmpdir}/archive.zip --secure False --logs_flush_interval 60')
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault store x in other_frames')
+        with raises(KeyError):
+            ipython.magic('vault import x from missing_frames')
+    with gzip.open(logs_path, 'rt') as f:
+        assert len(f.readlines()) == 3
+
+    # and on close
+    with patch_ipython_globals(locals()):
+        ipython.magic('vault del x from other_frames')
+    ipython.magic('close_vault')
+    with gzip.open(logs_path, 'rt') as f:
+        assert json.loads(f.readlines()[-1])['action'] == 'del'
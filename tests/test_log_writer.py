@@ -0,0 +1,69 @@
+import gzip
+import json
+from unittest.mock import Mock
+
+from pytest import raises
+
+from data_vault.history import History
+from data_vault.log_writer import LogWriter
+
+
+def read_logs(path):
+    with gzip.open(path, 'rt') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_log_writer(tmpdir):
+    path = f'{tmpdir}/logs.gz'
+    history = Mock()
+    writer = LogWriter(path, history=history, max_records=3, max_delay=60)
+
+    writer.write({'n': 1})
+    writer.write({'n': 2})
+    writer.flush()
+    assert read_logs(path) == [{'n': 1}, {'n': 2}]
+    history.record.assert_called_once_with({'n': 1}, {'n': 2})
+
+    # flushed in the background once the buffer is full
+    for n in range(3, 6):
+        writer.write({'n': n})
+    writer._thread.join(timeout=0.2)
+    assert len(read_logs(path)) == 5
+
+    writer.write({'n': 6})
+    writer.close()
+    assert [record['n'] for record in read_logs(path)] == [1, 2, 3, 4, 5, 6]
+    assert not writer._thread.is_alive()
+
+
+def test_log_writer_error(tmpdir):
+    path = f'{tmpdir}/logs.gz'
+    history = Mock()
+    history.record.side_effect = [OSError('disk full'), None]
+    writer = LogWriter(path, history=history, max_records=1, max_delay=60)
+
+    writer.write({'n': 1})
+    writer._thread.join(timeout=0.2)
+    # the error of the background flush is raised on the next write, and the records are kept
+    with raises(OSError, match='disk full'):
+        writer.write({'n': 2})
+    writer.close()
+    history.record.assert_called_with({'n': 1}, {'n': 2})
+
+
+def test_log_writer_after_close(tmpdir):
+    path = f'{tmpdir}/logs.gz'
+    history = History(f'{tmpdir}/history.sqlite')
+    writer = LogWriter(path, history=history, max_delay=60)
+    record = {'action': 'import', 'finished': '2024-01-01T10:00:00', 'result': [{'path': 'my_frames/x'}]}
+    writer.write({**record, 'n': 1})
+    writer.close()
+    history.close()
+
+    # e.g. a lazily imported variable loaded after the vault was closed
+    writer.write({**record, 'n': 2})
+    assert [record['n'] for record in read_logs(path)] == [1, 2]
+
+    history = History(f'{tmpdir}/history.sqlite')
+    assert len(history.query('my_frames/x')) == 2
+    history.close()
@@ -0,0 +1,25 @@
+from data_vault.member_tree import MemberTree
+
+
+def test_member_tree():
+    tree = MemberTree.from_paths([
+        'datasets/x',
+        'datasets/2024/q1/y',
+        'datasets/2024/q2/',
+        'other/z',
+        'x'
+    ])
+    assert tree.list() == ['datasets/x', 'datasets/2024/q1/y', 'other/z', 'x']
+    assert tree.list('datasets') == ['x', '2024/q1/y']
+    assert tree.list('datasets/2024/q1') == ['y']
+    assert tree.list('datasets/2024/q2') == []
+    assert tree.list('missing') == []
+
+    assert tree.list_children() == ['datasets', 'other', 'x']
+    assert tree.list_children('datasets/2024') == ['q1', 'q2']
+
+    assert 'datasets/2024/q1/y' in tree
+    assert 'datasets/2024' not in tree
+    assert 'datasets/y' not in tree
+    assert tree.is_folder('datasets/2024')
+    assert not tree.is_folder('datasets/x')
@@ -1,6 +1,7 @@
 from random import random, randint, choice, seed
 
-from pandas import DataFrame
+from pandas import DataFrame, Series
+from numpy import nan
 
 from data_vault.memory import optimize_memory
 
@@ -29,3 +30,39 @@ def test_optimize_memory():
 
     df_cat_num = optimize_memory(df, inplace=False, categorise_numbers=True)
     assert df_cat_num.repetitive_large_int.dtype == 'category'
+
+
+def test_downcast_numbers():
+    df = DataFrame({
+        'unsigned': [0, 200, 255],
+        'signed': [-200, 0, 200],
+        'large': [0, 2 ** 40, 1],
+        'nullable': Series([1, None, 300], dtype='Int64'),
+        'integers_with_missing_data': [1.0, nan, 3.0],
+        'float': [0.5, 0.25, 0.125],
+        'precise_float': [1 / 3, 0.25, 0.125]
+    })
+    df_new = optimize_memory(df, inplace=False, float_tolerance=1e-9, nullable_integers=True)
+
+    assert df_new.unsigned.dtype == 'uint8'
+    assert df_new.signed.dtype == 'int16'
+    assert df_new.large.dtype == 'int64'
+    assert df_new.nullable.dtype == 'Int16'
+    assert df_new.integers_with_missing_data.dtype == 'Int8'
+    assert df_new.integers_with_missing_data.isnull().tolist() == [False, True, False]
+    assert df_new.float.dtype == 'float32'
+    assert df_new.precise_float.dtype == 'float64'
+
+    df_kept = optimize_memory(df, inplace=False)
+    assert df_kept.integers_with_missing_data.dtype == 'float64'
+    assert df_kept.float.dtype == 'float64'
+
+
+def test_optimize_memory_report(capsys):
+    df = DataFrame({'text': ['a', 'b'] * 50, 'unique_text': [str(i) for i in range(100)]})
+    optimize_memory(df, report=True)
+
+    report = capsys.readouterr().out
+    assert ' - text: ' in report
+    assert 'unique_text' not in report
+    assert 'seconds' in report
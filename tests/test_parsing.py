@@ -1,5 +1,5 @@
 from data_vault import clean_line
-from data_vault.parsing import unquote, bool_or_str
+from data_vault.parsing import unquote, bool_or_str, parse_arguments
 
 
 def test_clean_line():
@@ -32,3 +32,13 @@ def test_bool_or_str():
     assert bool_or_str('True') is True
     assert bool_or_str('False') is False
     assert bool_or_str('true') == 'true'
+
+
+def test_parse_arguments():
+    defaults = {'booleans_as_categories': False, 'backend': 'auto', 'path': 'storage.zip'}
+    assert parse_arguments('-b True -p a.zip', defaults) == {
+        'booleans_as_categories': True, 'backend': 'auto', 'path': 'a.zip'
+    }
+    # the alias belongs to the first setting starting with given letter
+    assert parse_arguments('--backend 7z', defaults)['backend'] == '7z'
+    assert parse_arguments('-b False', defaults)['backend'] == 'auto'
@@ -0,0 +1,14 @@
+from data_vault.shards import ShardIndex
+
+
+def test_shard_index(tmpdir):
+    index = ShardIndex(f'{tmpdir}/storage')
+    assert index.shard_of('datasets/2024/x') == 'datasets'
+    assert index.shard_of('x') == '.root'
+    assert index.archive_path('datasets') == f'{tmpdir}/storage/datasets.zip'
+
+    assert index.shards() == []
+    index.register('datasets')
+    index.register('.root')
+    index.register('datasets')
+    assert index.shards() == ['.root', 'datasets']
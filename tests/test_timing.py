@@ -0,0 +1,57 @@
+from time import sleep
+
+import numpy as np
+from pytest import mark
+
+from data_vault import timing
+from data_vault.timing import Timings, count, phase
+from data_vault.workers import map_in_order
+
+
+def test_timings():
+    # not recorded outside of the timed operation
+    with phase('outside'):
+        count('outside', 10)
+
+    with Timings() as timings:
+        with phase('outer'):
+            with phase('inner'):
+                sleep(0.02)
+            count('inner', 10)
+        with phase('inner'):
+            count('inner', 5)
+
+    assert set(timings.as_dict()) == {'outer', 'inner'}
+    # the nested phase is not counted towards the outer one
+    assert timings.durations['outer'] < 0.02 <= timings.durations['inner']
+    assert timings.slowest() == 'inner'
+    assert timings.as_dict()['inner']['bytes'] == 15
+    assert 'bytes' not in timings.as_dict()['outer']
+
+
+def test_timings_of_workers():
+    def work(item):
+        with phase('work'):
+            count('work', item)
+
+    with Timings() as timings:
+        map_in_order(work, [1, 2, 3], workers=3)
+    assert timings.sizes['work'] == 6
+
+
+@mark.parametrize('can_reset_peak', [True, False])
+def test_track_memory(monkeypatch, can_reset_peak):
+    # the peak cannot be reset before Python 3.9
+    monkeypatch.setattr(timing, '_CAN_RESET_PEAK', can_reset_peak and timing._CAN_RESET_PEAK)
+    with Timings(track_memory=True) as timings:
+        with phase('allocate'):
+            data = np.ones(2 ** 20)
+            with phase('copy'):
+                np.ones(2 ** 21)
+        del data
+    phases = timings.as_dict()
+    # peaks of the outer phase include the nested phases
+    assert phases['copy']['peak_memory'] >= 2 ** 24
+    assert phases['allocate']['peak_memory'] >= 2 ** 24 + 2 ** 23
+    assert timings.memory()['peak_memory'] >= phases['allocate']['peak_memory']
+    assert 'rss_delta' in phases['allocate']